@@ -31,6 +31,72 @@ import time
 from pathlib import Path
 import importlib
 import inspect
+import ast
+import functools
+
+# AST nodes allowed in a string constraint evaluated on arrays of points. Anything else (function calls, attributes, subscripts, "in", "is", ...) is evaluated point by point
+_VECTORIZABLE_NODES = (ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Name, ast.Load, ast.Constant,
+        ast.And, ast.Or, ast.Not, ast.USub, ast.UAdd, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+        ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+class _VectorizeConstraint(ast.NodeTransformer):
+
+    """ Rewrite "and", "or", "not" and chained comparisons into their elementwise NumPy counterparts """
+
+    def asbool(self, node):
+        return ast.Call(func=ast.Attribute(value=ast.Name(id='__gptune_np__', ctx=ast.Load()), attr='asarray', ctx=ast.Load()), args=[node], keywords=[ast.keyword(arg='dtype', value=ast.Name(id='bool', ctx=ast.Load()))])
+
+    def combine(self, op, nodes):
+        node = self.asbool(nodes[0])
+        for node_ in nodes[1:]:
+            node = ast.BinOp(left=node, op=op, right=self.asbool(node_))
+        return node
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        return self.combine(ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr(), node.values)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=self.asbool(node.operand))
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        operands = [node.left] + node.comparators
+        return self.combine(ast.BitAnd(), [ast.Compare(left=operands[i], ops=[node.ops[i]], comparators=[operands[i+1]]) for i in range(len(node.ops))])
+
+@functools.lru_cache(maxsize=None)
+def compile_constraint(cst : str):
+
+    """ Compile a string constraint once per process. Returns the code object evaluated on a single point, the code object evaluated on arrays of points (None if the constraint cannot be vectorized) and the variable names used by the constraint """
+
+    code = compile(cst, '<constraint>', 'eval')
+    tree = ast.parse(cst, mode='eval')
+    names = frozenset(node.id for node in ast.walk(tree) if isinstance(node, ast.Name))
+    if all(isinstance(node, _VECTORIZABLE_NODES) for node in ast.walk(tree)):
+        tree = ast.fix_missing_locations(_VectorizeConstraint().visit(tree))
+        code_vec = compile(tree, '<constraint>', 'eval')
+    else:
+        code_vec = None
+    return (code, code_vec, names)
+
+@functools.lru_cache(maxsize=None)
+def _constraint_parameters(cst : Callable):
+
+    return frozenset(inspect.signature(cst).parameters)
+
+def constraint_parameters(cst : Callable):
+
+    """ Names of the arguments of a callable constraint, cached per callable """
+
+    try:
+        return _constraint_parameters(cst)
+    except TypeError: # unhashable callable
+        return frozenset(inspect.signature(cst).parameters)
 
 class Computer(object):
 
@@ -47,51 +113,125 @@ class Computer(object):
 #       kwargs['constraints_evaluation_parallelism']
 
         # points can be either a dict or a list of dicts on which to iterate
+        if (isinstance(point, list)):
+            return self.evaluate_constraints_batch(problem, point, inputs_only = inputs_only, **kwargs)
+
         if(problem.constants is not None):
             point.update(problem.constants)
         cond = True
         for (cstname, cst) in problem.constraints.items():
             if (isinstance(cst, str)):
-                try:
-                    # {} has to be the global argument to eval
-                    # and point the local one, otherwise,
-                    # point will be corrupted / updated by eval
-                    cond = eval(cst, {}, point)
-                except Exception as inst:
-                    if (inputs_only and isinstance(inst, NameError)):
-                        pass
-                    else:
-                        raise Exception(f"Unexpected exception '{inst}' was raised while evaluating constraint '{cstname}'. Correct this constraint before calling the tuner again.")
+                (code, code_vec, names) = compile_constraint(cst)
+                cond = self.evaluate_string_constraint(code, cstname, point, inputs_only, cond)
             else:
-                try:
-                    if(hasattr(problem, 'driverabspath')): # differentiate between Problem and TuningProblem 
-                        if(problem.driverabspath is not None):
-                            modulename = Path(problem.driverabspath).stem  # get the driver name excluding all directories and extensions
-                            sys.path.append(problem.driverabspath) # add path to sys
-                            module = importlib.import_module(modulename) # import driver name as a module
-                            cst = getattr(module, cstname)
-                        else:
-                            raise Exception('the driverabspath is required for the constraints')        
-                    kwargs2 = {}
-                    sig = inspect.signature(cst)
-                    for varname in point:
-                        if (varname in sig.parameters):
-                            kwargs2[varname] = point[varname]
-                    cond = cst(**kwargs2)
-                except Exception as inst:
-                    if (isinstance(inst, TypeError)):
-                        lst = inst.__str__().split()
-                        if (len(lst) >= 5 and lst[1] == 'missing' and lst[3] == 'required' and lst[4] == 'positional'):
-                            pass
-                        else:
-                            raise Exception(f"Unexpected exception '{inst}' was raised while evaluating constraint '{cstname}'. Correct this constraint before calling the tuner again.")
-                    else:
-                        raise Exception(f"Unexpected exception '{inst}' was raised while evaluating constraint '{cstname}'. Correct this constraint before calling the tuner again.")
+                cst = self.get_callable_constraint(problem, cstname, cst)
+                cond = self.evaluate_callable_constraint(cst, cstname, point, cond)
             if (not cond):
                 break
 
         return cond
 
+    def evaluate_constraints_batch(self, problem, points : Collection[dict], inputs_only : bool = False, **kwargs):  # points is a list of dicts in the original spaces, returns a boolean feasibility mask
+
+        if(problem.constants is not None):
+            for point in points:
+                point.update(problem.constants)
+        mask = np.ones(len(points), dtype=bool)
+        columns = {}
+        for (cstname, cst) in problem.constraints.items():
+            idx = np.flatnonzero(mask)
+            if (len(idx) == 0):
+                break
+            if (isinstance(cst, str)):
+                (code, code_vec, names) = compile_constraint(cst)
+                if (code_vec is not None):
+                    self.constraint_columns(points, names, columns)
+                    if (all(columns[varname] is not None for varname in names)):
+                        try:
+                            with np.errstate(all='ignore'):
+                                cond = np.asarray(eval(code_vec, {'__gptune_np__': np}, {varname: columns[varname] for varname in names}))
+                            if (cond.ndim == 0):
+                                cond = np.full(len(points), bool(cond))
+                            if (cond.shape == (len(points),)):
+                                mask &= cond.astype(bool)
+                                continue
+                        except Exception:
+                            pass # e.g. operands not supported by NumPy, evaluate the constraint point by point instead
+                for i in idx:
+                    mask[i] = self.evaluate_string_constraint(code, cstname, points[i], inputs_only, True)
+            else:
+                cst = self.get_callable_constraint(problem, cstname, cst)
+                for i in idx:
+                    mask[i] = self.evaluate_callable_constraint(cst, cstname, points[i], True)
+
+        return mask
+
+    def constraint_columns(self, points : Collection[dict], names : Collection[str], columns : dict):
+
+        """ Transpose the variables names of a list of points into NumPy arrays (or scalars for values shared by all points) stored in columns. Variables that are missing or have mixed or non-scalar types are stored as None """
+
+        for varname in names:
+            if (varname in columns):
+                continue
+            columns[varname] = None
+            if (varname not in points[0]):
+                continue
+            v0 = points[0][varname]
+            try:
+                values = [point[varname] for point in points]
+            except KeyError:
+                continue
+            types = set(map(type, values))
+            if all(v is v0 for v in values):
+                columns[varname] = v0
+            elif (types == {str}):
+                columns[varname] = np.array(values, dtype=object)
+            elif all(issubclass(t, (float, np.floating)) for t in types):
+                columns[varname] = np.array(values, dtype=float)
+            elif all(issubclass(t, (int, float, np.bool_, np.integer, np.floating)) for t in types): # integers are kept as they are in an object array, so that the operators have the semantics of eval (e.g. unbounded Python ints) instead of wrapping around in int64
+                columns[varname] = np.array(values, dtype=object)
+
+    def evaluate_string_constraint(self, code, cstname, point : dict, inputs_only : bool, cond):
+        try:
+            # {} has to be the global argument to eval
+            # and point the local one, otherwise,
+            # point will be corrupted / updated by eval
+            cond = eval(code, {}, point)
+        except Exception as inst:
+            if (inputs_only and isinstance(inst, NameError)):
+                pass
+            else:
+                raise Exception(f"Unexpected exception '{inst}' was raised while evaluating constraint '{cstname}'. Correct this constraint before calling the tuner again.")
+        return cond
+
+    def get_callable_constraint(self, problem, cstname, cst):
+        if(hasattr(problem, 'driverabspath')): # differentiate between Problem and TuningProblem 
+            if(problem.driverabspath is not None):
+                module = problem.driver_module()
+                cst = getattr(module, cstname)
+            else:
+                raise Exception('the driverabspath is required for the constraints')        
+        return cst
+
+    def evaluate_callable_constraint(self, cst, cstname, point : dict, cond):
+        try:
+            params = constraint_parameters(cst)
+            kwargs2 = {}
+            for varname in point:
+                if (varname in params):
+                    kwargs2[varname] = point[varname]
+            cond = cst(**kwargs2)
+        except Exception as inst:
+            if (isinstance(inst, TypeError)):
+                lst = inst.__str__().split()
+                if (len(lst) >= 5 and lst[1] == 'missing' and lst[3] == 'required' and lst[4] == 'positional'):
+                    pass
+                else:
+                    raise Exception(f"Unexpected exception '{inst}' was raised while evaluating constraint '{cstname}'. Correct this constraint before calling the tuner again.")
+            else:
+                raise Exception(f"Unexpected exception '{inst}' was raised while evaluating constraint '{cstname}'. Correct this constraint before calling the tuner again.")
+        return cond
+
 
     def evaluate_objective(self, problem : Problem, I : np.ndarray = None, P : Collection[np.ndarray] = None, D: Collection[dict] = None, history_db : HistoryDB = None, options: dict=None, is_pilot = False): # P and I are in the normalized space
 
@@ -238,9 +378,7 @@ class Computer(object):
         I_orig = problem.IS.inverse_transform(np.array(T2, ndmin=2))[0]
 
         if(problem.driverabspath is not None and options['distributed_memory_parallelism']):
-            modulename = Path(problem.driverabspath).stem  # get the driver name excluding all directories and extensions
-            sys.path.append(problem.driverabspath) # add path to sys
-            module = importlib.import_module(modulename) # import driver name as a module
+            module = problem.driver_module()
             # func = getattr(module, funcName)
         else:
             module =problem
@@ -439,9 +577,7 @@ class Computer(object):
         I_orig = problem.IS.inverse_transform(np.array(T2, ndmin=2))[0]
 
         if(problem.driverabspath is not None and options['distributed_memory_parallelism']):
-            modulename = Path(problem.driverabspath).stem  # get the driver name excluding all directories and extensions
-            sys.path.append(problem.driverabspath) # add path to sys
-            module = importlib.import_module(modulename) # import driver name as a module
+            module = problem.driver_module()
             # func = getattr(module, funcName)
         else:
             module =problem
@@ -53,6 +53,39 @@ class Categoricalnorm(Categorical):
     def transformed_size(self):
         return 1
 
+class ParetoArchive(object):
+    # Non-dominated subset (for minimization) of the rows of the outputs of one task, updated incrementally as new rows arrive.
+    # F holds the outputs of the front and idx their row indices in the outputs the archive was built from; n is the number of rows seen so far.
+    # A row weakly dominated by the front (including a duplicate of a front row) is not added, and rows containing NaN are ignored.
+
+    def __init__(self, DO : int, O = None):
+
+        self.F = np.empty((0, DO))
+        self.idx = np.empty(0, dtype=int)
+        self.n = 0
+        if (O is not None):
+            self.update(O)
+
+    def __len__(self):
+
+        return len(self.idx)
+
+    def update(self, O):
+
+        # add the rows of O, numbered after the rows seen so far, in O(front size) per row
+
+        O = np.array(O, dtype=float, ndmin=2)
+        for y in O:
+            i = self.n
+            self.n += 1
+            if (np.any(np.isnan(y))):
+                continue
+            if (np.any(np.all(self.F <= y, axis=1))):
+                continue
+            keep = ~np.all(y <= self.F, axis=1)
+            self.F = np.concatenate((self.F[keep], y[np.newaxis,:]))
+            self.idx = np.concatenate((self.idx[keep], [i]))
+
 class Data(object):
     # To GPTune I is 2D numpy array. To user I is a list of lists
     # To GPTune P is a list/collection of 2D numpy array with column dimension corresponding to PS dimension. To user P is a list of (list of lists)
@@ -81,6 +114,9 @@ class Data(object):
 
         self.D = D
 
+        self._config_index = {} # tid -> (P[tid] the index was built from, its length, set of configurations in the original space)
+        self._pareto = {} # tid -> (O[tid] the archive was built from, its length, ParetoArchive of O[tid])
+
     @property
     def NI(self):
 
@@ -129,6 +165,58 @@ class Data(object):
 
         pass
 
+    @staticmethod
+    def config_key(x_orig):
+
+        # hashable canonical form of a configuration in the original parameter space
+
+        return tuple(tuple(v) if isinstance(v, list) else v for v in x_orig)
+
+    def config_index(self, tid : int) -> set:
+
+        # set of the configurations of task tid in the original space (P[tid] is in the normalized space), rebuilt only if P[tid] was replaced
+
+        if (self.P is None or tid >= len(self.P) or self.P[tid] is None or len(self.P[tid]) == 0):
+            return set()
+        index = getattr(self, '_config_index', None)
+        if (index is None):
+            index = self._config_index = {}
+        entry = index.get(tid)
+        if (entry is None or entry[0] is not self.P[tid] or entry[1] != len(self.P[tid])):
+            P_orig = self.problem.PS.inverse_transform(np.array(self.P[tid], ndmin=2))
+            entry = (self.P[tid], len(self.P[tid]), set(map(self.config_key, P_orig)))
+            index[tid] = entry
+        return entry[2]
+
+    def has_config(self, tid : int, x_orig) -> bool:
+
+        # whether the configuration x_orig (in the original space) was already evaluated for task tid
+
+        return self.config_key(x_orig) in self.config_index(tid)
+
+    def pareto_archive(self, tid : int) -> ParetoArchive:
+
+        # incremental Pareto archive of the outputs of task tid, rebuilt only if O[tid] was replaced
+
+        DO = self.problem.DO
+        if (self.O is None or tid >= len(self.O) or self.O[tid] is None or len(self.O[tid]) == 0):
+            return ParetoArchive(DO)
+        pareto = getattr(self, '_pareto', None)
+        if (pareto is None):
+            pareto = self._pareto = {}
+        entry = pareto.get(tid)
+        if (entry is None or entry[0] is not self.O[tid] or entry[1] != len(self.O[tid])):
+            entry = (self.O[tid], len(self.O[tid]), ParetoArchive(DO, np.array(self.O[tid], dtype=float).reshape(-1, DO)))
+            pareto[tid] = entry
+        return entry[2]
+
+    def pareto_front(self, tid : int):
+
+        # (row indices, outputs) of the non-dominated samples of task tid
+
+        archive = self.pareto_archive(tid)
+        return (archive.idx.copy(), archive.F.copy())
+
     # TODO
     def merge(self, newdata):
 
@@ -140,8 +228,26 @@ class Data(object):
         if (not np.array_equal(self.D, newdata.D)):
             raise Exception("The tasks dictionaries in the newdata should be the same as the current tasks")
 
-        self.P = [np.concatenate((self.P[i], newdata.P[i])) for i in range(len(self.P))]
-        self.O = [np.concatenate((self.O[i], newdata.O[i])) for i in range(len(self.O))]
+        index = getattr(self, '_config_index', {})
+        P = [np.concatenate((self.P[i], newdata.P[i])) for i in range(len(self.P))]
+        for i in range(len(self.P)):
+            entry = index.get(i)
+            if (entry is not None and entry[0] is self.P[i] and entry[1] == len(self.P[i])): # update the configuration index with the new samples only
+                configs = entry[2]
+                if (len(newdata.P[i]) > 0):
+                    configs.update(map(self.config_key, self.problem.PS.inverse_transform(np.array(newdata.P[i], ndmin=2))))
+                index[i] = (P[i], len(P[i]), configs)
+        self.P = P
+        pareto = getattr(self, '_pareto', {})
+        O = [np.concatenate((self.O[i], newdata.O[i])) for i in range(len(self.O))]
+        for i in range(len(self.O)):
+            entry = pareto.get(i)
+            if (entry is not None and entry[0] is self.O[i] and entry[1] == len(self.O[i])): # update the Pareto archive with the new samples only
+                archive = entry[2]
+                if (len(newdata.O[i]) > 0):
+                    archive.update(np.array(newdata.O[i], dtype=float).reshape(-1, self.problem.DO))
+                pareto[i] = (O[i], len(O[i]), archive)
+        self.O = O
 
 #    def insert(I = None: np.ndarray, P = None : Collection[np.ndarray], O = None : Collection[np.ndarray]):
 #
@@ -1124,6 +1124,52 @@ class HistoryDB(dict):
                             "func_eval":[]}
                         json.dump(json_data, f_out, indent=2)
 
+    def update_json_data(self, json_data_path : str, key : str, new_items : list, update = None):
+
+        # add new_items (each with a "uid") to the list json_data[key] of the database file json_data_path, or apply update(json_data) instead, synchronized with file_synchronization_method
+
+        if update is None:
+            def update(json_data):
+                json_data[key] += new_items
+
+        if self.file_synchronization_method == 'filelock':
+            with FileLock(json_data_path+".lock"):
+                with open(json_data_path, "r") as f_in:
+                    json_data = json.load(f_in)
+                    update(json_data)
+                with open(json_data_path, "w") as f_out:
+                    json.dump(json_data, f_out, indent=2)
+        elif self.file_synchronization_method == 'rsync':
+            while True:
+                temp_path = json_data_path + "." + self.process_uid + ".temp"
+                os.system("rsync -a " + json_data_path + " " + temp_path)
+                with open(temp_path, "r") as f_in:
+                    json_data = json.load(f_in)
+                    update(json_data)
+                with open(temp_path, "w") as f_out:
+                    json.dump(json_data, f_out, indent=2)
+                os.system("rsync -u " + temp_path + " " + json_data_path)
+                os.system("rm " + temp_path)
+                with open(json_data_path, "r") as f_in:
+                    json_data = json.load(f_in)
+                    existing_uids = [item["uid"] for item in json_data.get(key, [])]
+                    new_uids = [item["uid"] for item in new_items]
+                    retry = False
+                    for uid in new_uids:
+                        if uid not in existing_uids:
+                            retry = True
+                            break
+                    if retry == False:
+                        break
+        else:
+            with open(json_data_path, "r") as f_in:
+                json_data = json.load(f_in)
+                update(json_data)
+            with open(json_data_path, "w") as f_out:
+                json.dump(json_data, f_out, indent=2)
+
+        return
+
     def store_func_eval(self, problem : Problem,\
             task_parameter : np.ndarray,\
             tuning_parameter : np.ndarray,\
@@ -1258,41 +1304,49 @@ class HistoryDB(dict):
                     except:
                         print ("direct upload failed")
 
-            if self.file_synchronization_method == 'filelock':
-                with FileLock(json_data_path+".lock"):
-                    with open(json_data_path, "r") as f_in:
-                        json_data = json.load(f_in)
-                        json_data["func_eval"] += new_function_evaluation_results
-                    with open(json_data_path, "w") as f_out:
-                        json.dump(json_data, f_out, indent=2)
-            elif self.file_synchronization_method == 'rsync':
-                while True:
-                    temp_path = json_data_path + "." + self.process_uid + ".temp"
-                    os.system("rsync -a " + json_data_path + " " + temp_path)
-                    with open(temp_path, "r") as f_in:
-                        json_data = json.load(f_in)
-                        json_data["func_eval"] += new_function_evaluation_results
-                    with open(temp_path, "w") as f_out:
-                        json.dump(json_data, f_out, indent=2)
-                    os.system("rsync -u " + temp_path + " " + json_data_path)
-                    os.system("rm " + temp_path)
-                    with open(json_data_path, "r") as f_in:
-                        json_data = json.load(f_in)
-                        existing_uids = [item["uid"] for item in json_data["func_eval"]]
-                        new_uids = [item["uid"] for item in new_function_evaluation_results]
-                        retry = False
-                        for uid in new_uids:
-                            if uid not in existing_uids:
-                                retry = True
-                                break
-                        if retry == False:
-                            break
-            else:
-                with open(json_data_path, "r") as f_in:
-                    json_data = json.load(f_in)
-                    json_data["func_eval"] += new_function_evaluation_results
-                with open(json_data_path, "w") as f_out:
-                    json.dump(json_data, f_out, indent=2)
+            self.update_json_data(json_data_path, "func_eval", new_function_evaluation_results)
+
+        return
+
+    def store_pareto_front(self, problem : Problem, data : Data, tids : list):
+
+        # store the Pareto front of the tasks tids (only the non-dominated samples), replacing the previously stored front of each task
+
+        if (self.tuning_problem_name is not None):
+            json_data_path = self.historydb_path+"/"+self.tuning_problem_name+".json"
+
+            now = time.localtime()
+
+            new_pareto_fronts = []
+            for tid in tids:
+                (idx, F) = data.pareto_front(tid)
+                task_parameter_orig = problem.IS.inverse_transform(np.array(data.I[tid], ndmin=2))[0]
+                task_parameter_store = { problem.IS[k].name:np.array(task_parameter_orig[k]).tolist() for k in range(len(problem.IS)) }
+                task_parameter_store.pop("tla_id", None)
+                tuning_parameter_orig = problem.PS.inverse_transform(np.array(data.P[tid][idx], ndmin=2)) if len(idx) > 0 else []
+                new_pareto_fronts.append({
+                        "task_parameter":task_parameter_store,
+                        "tuning_parameter":[{ problem.PS[k].name:np.array(x[k]).tolist() for k in range(len(problem.PS)) } for x in tuning_parameter_orig],
+                        "evaluation_result":[{ problem.OS[k].name:round(float(y[k]), 6) for k in range(len(problem.OS)) } for y in F],
+                        "time":{
+                            "tm_year":now.tm_year,
+                            "tm_mon":now.tm_mon,
+                            "tm_mday":now.tm_mday,
+                            "tm_hour":now.tm_hour,
+                            "tm_min":now.tm_min,
+                            "tm_sec":now.tm_sec,
+                            "tm_wday":now.tm_wday,
+                            "tm_yday":now.tm_yday,
+                            "tm_isdst":now.tm_isdst
+                            },
+                        "uid":str(uuid.uuid1())
+                    })
+
+            def update_pareto_fronts(json_data):
+                tasks = [item["task_parameter"] for item in new_pareto_fronts]
+                json_data["pareto_front"] = [item for item in json_data.get("pareto_front", []) if item["task_parameter"] not in tasks] + new_pareto_fronts
+
+            self.update_json_data(json_data_path, "pareto_front", new_pareto_fronts, update = update_pareto_fronts)
 
         return
 
@@ -1938,41 +1992,7 @@ class HistoryDB(dict):
                     # we might need a nicer way to manage different models
                 })
 
-            if self.file_synchronization_method == 'filelock':
-                with FileLock(json_data_path+".lock"):
-                    with open(json_data_path, "r") as f_in:
-                        json_data = json.load(f_in)
-                        json_data["surrogate_model"] += new_surrogate_models
-                    with open(json_data_path, "w") as f_out:
-                        json.dump(json_data, f_out, indent=2)
-            elif self.file_synchronization_method == 'rsync':
-                while True:
-                    temp_path = json_data_path + "." + self.process_uid + ".temp"
-                    os.system("rsync -a " + json_data_path + " " + temp_path)
-                    with open(temp_path, "r") as f_in:
-                        json_data = json.load(f_in)
-                        json_data["surrogate_model"] += new_surrogate_models
-                    with open(temp_path, "w") as f_out:
-                        json.dump(json_data, f_out, indent=2)
-                    os.system("rsync -u " + temp_path + " " + json_data_path)
-                    os.system("rm " + temp_path)
-                    with open(json_data_path, "r") as f_in:
-                        json_data = json.load(f_in)
-                        existing_uids = [item["uid"] for item in json_data["surrogate_model"]]
-                        new_uids = [item["uid"] for item in new_surrogate_models]
-                        retry = False
-                        for uid in new_uids:
-                            if uid not in existing_uids:
-                                retry = True
-                                break
-                        if retry == False:
-                            break
-            else:
-                with open(json_data_path, "r") as f_in:
-                    json_data = json.load(f_in)
-                    json_data["surrogate_model"] += new_surrogate_models
-                with open(json_data_path, "w") as f_out:
-                    json.dump(json_data, f_out, indent=2)
+            self.update_json_data(json_data_path, "surrogate_model", new_surrogate_models)
 
         return
 
@@ -2024,40 +2044,6 @@ class HistoryDB(dict):
                     # we might need a nicer way to manage different models
                 })
 
-            if self.file_synchronization_method == 'filelock':
-                with FileLock(json_data_path+".lock"):
-                    with open(json_data_path, "r") as f_in:
-                        json_data = json.load(f_in)
-                        json_data["surrogate_model"] += new_surrogate_models
-                    with open(json_data_path, "w") as f_out:
-                        json.dump(json_data, f_out, indent=2)
-            elif self.file_synchronization_method == 'rsync':
-                while True:
-                    temp_path = json_data_path + "." + self.process_uid + ".temp"
-                    os.system("rsync -a " + json_data_path + " " + temp_path)
-                    with open(temp_path, "r") as f_in:
-                        json_data = json.load(f_in)
-                        json_data["surrogate_model"] += new_surrogate_models
-                    with open(temp_path, "w") as f_out:
-                        json.dump(json_data, f_out, indent=2)
-                    os.system("rsync -u " + temp_path + " " + json_data_path)
-                    os.system("rm " + temp_path)
-                    with open(json_data_path, "r") as f_in:
-                        json_data = json.load(f_in)
-                        existing_uids = [item["uid"] for item in json_data["surrogate_model"]]
-                        new_uids = [item["uid"] for item in new_surrogate_models]
-                        retry = False
-                        for uid in new_uids:
-                            if uid not in existing_uids:
-                                retry = True
-                                break
-                        if retry == False:
-                            break
-            else:
-                with open(json_data_path, "r") as f_in:
-                    json_data = json.load(f_in)
-                    json_data["surrogate_model"] += new_surrogate_models
-                with open(json_data_path, "w") as f_out:
-                    json.dump(json_data, f_out, indent=2)
+            self.update_json_data(json_data_path, "surrogate_model", new_surrogate_models)
 
         return
@@ -38,6 +38,10 @@ import numpy as np
 import json
 from filelock import Timeout, FileLock
 from operator import mul
+
+# TODO: the value depends on the problem (output) definition
+MODEL_FUNCTION_OUTBOUND = 1000000.0 # output returned by the model functions for the tuning parameters outside the parameter space
+
 class GPTune(object):
 
     def __init__(self, tuningproblem : TuningProblem, computer : Computer = None, data : Data = None, historydb : HistoryDB = None, options : Options = None, driverabspath=None, models_update=None, **kwargs):
@@ -55,6 +59,8 @@ class GPTune(object):
         self.computer = computer
         if (data is None):
             data = Data(self.problem)
+        elif (not isinstance(data.problem, Problem)): # e.g. Data(tuningproblem) in the drivers, the indexes of Data (e.g. config_index) need the spaces of self.problem
+            data.problem = self.problem
         self.data     = data
         if (options is None):
             options = Options()
@@ -225,8 +231,7 @@ class GPTune(object):
                     ret[output_names[o]+"_var"] = var
             else:
                 for o in range(self.problem.DO):
-                    # TODO: the value depends on the problem (output) definition
-                    (mu, var) = [[1000000.0]], 0
+                    (mu, var) = [[MODEL_FUNCTION_OUTBOUND]], 0
                     ret[output_names[o]] = np.array(mu).tolist()
                     ret[output_names[o]+"_var"] = var
 
@@ -234,8 +239,62 @@ class GPTune(object):
 
             return ret
 
+        cache = {} # predictions of the configurations predicted with memoize=True, e.g. the training points of a target task, kept across the MLA iterations
+
+        def model_function_batch(task, configurations, memoize=False):
+
+            return self.PredictSurrogateModelBatch(modelers, 0, configurations, cache if memoize else None)
+
+        model_function.batch = model_function_batch # batched interface of model_function: the configurations of one task at once (see PredictSurrogateModelBatch)
+
         return (modelers, model_function)
 
+    def PredictSurrogateModelBatch(self, modelers, tid : int, configurations, cache : dict = None):
+
+        """ Batched version of the model functions returned by GenSurrogateModel and LoadSurrogateModel: predictions of the surrogate models modelers for task tid at the configurations (one configuration per row, in the original space, in the order of the tuning parameters).
+        Returns a dict with, for each output, a (n,1) array of means under its name and a (n,1) array of variances under its name + "_var". The configurations with an Integer parameter out of its bounds get the placeholder mean of the model functions and a NaN variance.
+        The predictions of the configurations found in cache (keyed by task and configuration) are reused, the others are added to it """
+
+        configurations = [list(x) for x in configurations]
+        n = len(configurations)
+        keys = [(tid, tuple(x)) for x in configurations]
+        MU = np.empty((n, self.problem.DO))
+        VAR = np.empty((n, self.problem.DO))
+
+        todo = [i for i in range(n) if cache is None or keys[i] not in cache]
+        bounds = [self.problem.PS.bounds[k] for k in range(len(self.problem.PS))]
+        integer = [type(self.problem.PS[k]).__name__ == "Integer" for k in range(len(self.problem.PS))]
+        bound_checked = [all(not integer[k] or bounds[k][0] <= configurations[i][k] <= bounds[k][1] for k in range(len(self.problem.PS))) for i in todo]
+        inbound = [i for (i, checked) in zip(todo, bound_checked) if checked]
+        outbound = [i for (i, checked) in zip(todo, bound_checked) if not checked]
+        if (len(inbound) > 0):
+            X = np.array(self.problem.PS.transform([configurations[i] for i in inbound]), ndmin=2)
+            for o in range(self.problem.DO):
+                if len(getattr(modelers[o], 'M_stacked', [])) > 0: # the stacked models predict a single point at a time
+                    pred = [modelers[o].predict(X[i], tid) for i in range(len(X))]
+                    MU[inbound,o] = [np.asarray(p[0]).ravel()[0] for p in pred]
+                    VAR[inbound,o] = [np.asarray(p[1]).ravel()[0] for p in pred]
+                else:
+                    (mu, var) = modelers[o].predict(X, tid)
+                    MU[inbound,o] = np.asarray(mu, dtype=float).ravel()
+                    VAR[inbound,o] = np.asarray(var, dtype=float).ravel()
+        MU[outbound] = MODEL_FUNCTION_OUTBOUND
+        VAR[outbound] = np.nan # no variance, as the placeholder variance of the model functions
+
+        if (cache is not None):
+            for i in todo:
+                cache[keys[i]] = (MU[i].copy(), VAR[i].copy())
+            for i in range(n):
+                (MU[i], VAR[i]) = cache[keys[i]]
+
+        ret = {}
+        for o in range(self.problem.DO):
+            ret[self.problem.OS[o].name] = MU[:,o:o+1]
+            ret[self.problem.OS[o].name+"_var"] = VAR[:,o:o+1]
+        ret["source"] = "model_function"
+
+        return ret
+
     def LoadSurrogateModel(self, model_data : dict, **kwargs):
 
         Tgiven = model_data["task_parameters"]
@@ -356,8 +415,7 @@ class GPTune(object):
                     ret[output_names[o]+"_var"] = var
             else:
                 for o in range(self.problem.DO):
-                    # TODO: the value depends on the problem (output) definition
-                    (mu, var) = [[1000000.0]], 0
+                    (mu, var) = [[MODEL_FUNCTION_OUTBOUND]], 0
                     ret[output_names[o]] = np.array(mu).tolist()
                     ret[output_names[o]+"_var"] = var
 
@@ -365,6 +423,25 @@ class GPTune(object):
 
             return ret
 
+        cache = {} # predictions of the configurations predicted with memoize=True, e.g. the training points of a target task, kept across the MLA iterations
+
+        def model_function_batch(task, configurations, memoize=False):
+
+            task_parameter_names = [self.problem.IS[k].name for k in range(len(self.problem.IS))]
+            input_task = [task[task_parameter_name] for task_parameter_name in task_parameter_names]
+            tid = -1
+            for i in range(len(Tgiven)):
+                if all(Tgiven[i][j] == input_task[j] for j in range(len(Tgiven[i]))):
+                    tid = i
+                    break
+            if tid == -1:
+                print ("[Error] cannot find model for the given input task: ", input_task)
+                return None
+
+            return self.PredictSurrogateModelBatch(modelers, tid, configurations, cache if memoize else None)
+
+        model_function.batch = model_function_batch # batched interface of model_function: the configurations of one task at once (see PredictSurrogateModelBatch)
+
         return (modelers, model_function)
 
     def MLA_LoadModel(self, NS = 0, Tgiven = None, method = "max_evals", update = 0, model_uid = None, **kwargs):
@@ -644,6 +721,8 @@ class GPTune(object):
             "time_loaddata": 0,
             "func_eval_time":[],
             "search_time":[],
+            "search_termination":[],
+            "search_budget":[],
             "modeling_time":[],
             "modeling_iteration":[]
         }
@@ -1009,20 +1088,21 @@ class GPTune(object):
                     print('time_model:',(t2-t1)/1e9)
 
             t1 = time.time_ns()
-            res = searcher.search_multitask(data = self.data, models = modelers, tids=tids, **kwargs)
+            tids_active = [i for i in tids if self.data.P[i].shape[0] < NS] # the tasks that reached NS samples are still used to train the models, but are not searched anymore
+            res = searcher.search_multitask_batch(data = self.data, models = modelers, tids=tids_active, **kwargs)
+            res = {res_[0]: res_[1][0] for res_ in res}
             newdata.P=[]
-            i1=0
             for i in range(NI):
-                if(T_sampleflag[i]== True):
-                    newdata.P.append(res[i1][1][0])
-                    i1=i1+1
+                if(i in res):
                     NSi = self.data.P[i].shape[0]
-                    newdata.P[i] = newdata.P[i][0:min(newdata.P[i].shape[0],max(0,NS-NSi)),:] # if NSi>=NS, skip the function evaluation                    
+                    newdata.P.append(res[i][0:min(res[i].shape[0],max(0,NS-NSi)),:]) # at most NS-NSi new samples
                 else:
                     newdata.P.append(np.empty(shape=(0,self.problem.DP)))
             # print(more_samples,newdata.P)
             t2 = time.time_ns()
             stats["search_time"].append((t2-t1)/1e9)
+            stats["search_termination"].append(searcher.search_terminations)
+            stats["search_budget"].append(searcher.search_budget)
             time_search = time_search + (t2-t1)/1e9
             if (self.options['RCI_mode'] == True):
                 print('time_search:',(t2-t1)/1e9)
@@ -1041,13 +1121,16 @@ class GPTune(object):
             t2 = time.time_ns()
             time_fun = time_fun + (t2-t1)/1e9
             stats["func_eval_time"].append((t2-t1)/1e9)
-            self.data.merge(newdata)
+            self.data.merge(newdata) # also updates the Pareto archives of the tasks incrementally
             # print(self.data.P)
             # print(list(map(mul,T_bit_mask,list(map(len, self.data.P)))))
             # print(tids)
             NS_active = [list(map(len, self.data.P))[index] for index in tids]
             NSmin = min(NS_active)
 
+        if (self.problem.DO > 1 and self.historydb is not None and self.data.O is not None):
+            self.historydb.store_pareto_front(self.problem, self.data, tids)
+
         # denormalize the data as the user always work in the original space
         if self.data.I is not None:    # from 2D numpy array to a list of lists
             self.data.I = self.problem.IS.inverse_transform(self.data.I)
@@ -1099,6 +1182,8 @@ class GPTune(object):
             "time_loaddata": 0,
             "func_eval_time":[],
             "search_time":[],
+            "search_termination":[],
+            "search_budget":[],
             "modeling_time":[],
             "modeling_iteration":[]
         }
@@ -1483,6 +1568,8 @@ class GPTune(object):
                 # print(more_samples,newdata.P)
                 t2 = time.time_ns()
                 stats["search_time"].append((t2-t1)/1e9)
+                stats["search_termination"].append(searcher.search_terminations)
+                stats["search_budget"].append(searcher.search_budget)
                 time_search = time_search + (t2-t1)/1e9
 
                 newdata_for_replica.O = []
@@ -2087,6 +2174,8 @@ class GPTune(object):
             "time_loaddata": 0,
             "func_eval_time":[],
             "search_time":[],
+            "search_termination":[],
+            "search_budget":[],
             "modeling_time":[],
             "modeling_iteration":[]
         }
@@ -2374,6 +2463,8 @@ class GPTune(object):
             # print(more_samples,newdata.P)
             t2 = time.time_ns()
             stats["search_time"].append((t2-t1)/1e9)
+            stats["search_termination"].append(searcher.search_terminations)
+            stats["search_budget"].append(searcher.search_budget)
             time_search = time_search + (t2-t1)/1e9
 
             t1 = time.time_ns()
@@ -2416,6 +2507,8 @@ class GPTune(object):
             "time_loaddata": 0,
             "func_eval_time":[],
             "search_time":[],
+            "search_termination":[],
+            "search_budget":[],
             "modeling_time":[],
             "modeling_iteration":[]
         }
@@ -2694,6 +2787,8 @@ class GPTune(object):
             # print(more_samples,newdata.P)
             t2 = time.time_ns()
             stats["search_time"].append((t2-t1)/1e9)
+            stats["search_termination"].append(searcher.search_terminations)
+            stats["search_budget"].append(searcher.search_budget)
             time_search = time_search + (t2-t1)/1e9
 
             t1 = time.time_ns()
@@ -2737,6 +2832,8 @@ class GPTune(object):
             "time_loaddata": 0,
             "func_eval_time":[],
             "search_time":[],
+            "search_termination":[],
+            "search_budget":[],
             "modeling_time":[],
             "modeling_iteration":[]
         }
@@ -3191,6 +3288,8 @@ class GPTune(object):
             # print(more_samples,newdata.P)
             t2 = time.time_ns()
             stats["search_time"].append((t2-t1)/1e9)
+            stats["search_termination"].append(searcher.search_terminations)
+            stats["search_budget"].append(searcher.search_budget)
             time_search = time_search + (t2-t1)/1e9
 
             t1 = time.time_ns()
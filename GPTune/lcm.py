@@ -209,13 +209,27 @@ class LCM(GPy.kern.Kern):
 
         pass
 
-    def gradients_X(self, dL_dK, X1, X2):
+    def gradients_X(self, dL_dK, X1, X2=None):   # gradient of sum(dL_dK * K(X1, X2)) with respect to X1, the task index column gets a zero gradient
+
+        if X2 is None:
+            dL_dK = dL_dK + dL_dK.T
+            X2 = X1
+        DI = self.input_dim - 1
+        idx1 = X1[:, DI].astype(int)
+        idx2 = X2[:, DI].astype(int)
+        BS = self.BS.reshape(self.Q, self.num_outputs, self.num_outputs)
+        grad = np.zeros((X1.shape[0], self.input_dim))
+        for q in range(self.Q):
+            theta2 = self.theta[q * DI : (q + 1) * DI] ** 2
+            dists = np.sum(((X1[:, np.newaxis, :DI] - X2[np.newaxis, :, :DI]) ** 2) / (2 * theta2), axis=2)
+            A = dL_dK * BS[q][np.ix_(idx1, idx2)] * self.var[q] * np.exp(-dists)
+            grad[:, :DI] -= (np.sum(A, axis=1)[:, np.newaxis] * X1[:, :DI] - np.dot(A, X2[:, :DI])) / theta2
 
-        raise("Not implemented")
+        return grad
 
-    def gradients_X_diag(self,dL_dKdiag,X):
+    def gradients_X_diag(self,dL_dKdiag,X):   # K(x, x) does not depend on x
 
-        raise("Not implemented")
+        return np.zeros(X.shape)
 
     def train_kernel(self, X, Y, computer, kwargs):
         npernode = int(computer.cores/kwargs['model_threads'])
@@ -17,6 +17,8 @@
 
 import abc
 import copy
+import threading
+from multiprocessing import shared_memory
 from typing import Collection, Tuple
 import numpy as np
 
@@ -29,6 +31,7 @@ from data import Data
 from mcmc import MCMC
 
 import scipy.optimize as op
+import scipy.linalg
 from scipy.stats import truncnorm, gamma, invgamma, norm, uniform
 
 
@@ -77,6 +80,100 @@ class Model(abc.ABC):
 
         raise Exception("Abstract method")
 
+    # make prediction on a batch of points (one point per row) of a specific task tid, together with the gradients of the mean and variance with respect to the points
+    # returns (mu, var, dmu, dvar) of shapes (n,1), (n,1), (n,d), (n,d). This default implementation uses forward finite differences evaluated in a single call to predict
+    def predict_gradients(self, points : np.ndarray, tid : int, **kwargs) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+
+        points = np.array(points, ndmin=2, dtype=float)
+        (n, d) = points.shape
+        h = 1e-6
+        x = np.repeat(points[np.newaxis, :, :], d + 1, axis=0)
+        for k in range(d):
+            x[k + 1, :, k] += h
+        x = x.reshape(-1, d)
+        if len(self.M_stacked) > 0: # the stacked models predict a single point at a time
+            pred = [self.predict(x[i,:], tid) for i in range(x.shape[0])]
+            mu = np.array([np.asarray(p[0]).ravel()[0] for p in pred])
+            var = np.array([np.asarray(p[1]).ravel()[0] for p in pred])
+        else:
+            (mu, var) = self.predict(x, tid)
+        mu = np.asarray(mu, dtype=float).reshape(d + 1, n)
+        var = np.asarray(var, dtype=float).reshape(d + 1, n)
+        dmu = ((mu[1:] - mu[0]) / h).T
+        dvar = ((var[1:] - var[0]) / h).T
+
+        return (mu[0].reshape(-1, 1), var[0].reshape(-1, 1), dmu, dvar)
+
+    # compact copy of the trained model for the search phase (see Model_GPy_Snapshot), None if the model does not support it
+    def snapshot(self):
+
+        return None
+
+    # NumPy copy of the trained model (see Model_Predictor) predicting batches of points for the search phase, None if the model does not support it
+    def export_predictor(self):
+
+        snapshot = self.snapshot()
+        if (snapshot is None):
+            return None
+        try:
+            return snapshot.export_predictor()
+        finally:
+            snapshot.close()
+
+    # function drawn from the posterior of the model (see Model_ThompsonSample), with n_features random Fourier features and the random seed seed. None if the model does not support it
+    def thompson_sample(self, n_features : int, seed : int = None):
+
+        snapshot = self.snapshot()
+        if (snapshot is None):
+            return None
+        try:
+            return snapshot.thompson_sample(n_features, seed)
+        finally:
+            snapshot.close()
+
+    # copy of the model conditioned on the additional (fantasized) observations values at points (one row per point, of task tids[i]), keeping the hyperparameters, used to propose batches of points (kriging believer or constant liar)
+    # the observations are added with rank-k updates of the Cholesky factor of the snapshot of the model. None if the model does not support it
+    def fantasize(self, points : np.ndarray, values : np.ndarray, tids : Collection[int]):
+
+        snapshot = self.snapshot()
+        if (snapshot is None):
+            return None
+        return snapshot.fantasize(points, values, tids)
+
+
+class SharedArray(object):
+
+    """ float64 array stored in a shared memory block. Pickling only transfers the name of the block, which the receiving process attaches to """
+
+    def __init__(self, array : np.ndarray):
+
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        self.shape = array.shape
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        self.array = np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)
+        self.array[...] = array
+        self.owner = True
+
+    def __getstate__(self):
+
+        return {'name': self.shm.name, 'shape': self.shape}
+
+    def __setstate__(self, state):
+
+        self.shape = state['shape']
+        self.shm = shared_memory.SharedMemory(name=state['name'])
+        self.array = np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)
+        self.owner = False
+
+    def close(self):
+
+        # the process that created the block also frees it
+        self.array = None
+        self.shm.close()
+        if (self.owner):
+            self.shm.unlink()
+            self.owner = False
+
 
 import GPy
 from GPy.kern import Kern
@@ -411,11 +508,32 @@ class Model_GPy_LCM(Model):
             # print(mu, var, 'gpy')
         return (mu, var)
 
+    def predict_gradients(self, points : np.ndarray, tid : int, **kwargs) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+
+        if len(self.M_stacked) > 0: # stacked model
+            return super().predict_gradients(points, tid, **kwargs)
+
+        points = np.array(points, ndmin=2, dtype=float)
+        x = np.empty((points.shape[0], points.shape[1] + 1))
+        x[:,:-1] = points
+        x[:,-1] = tid
+        (mu, var) = self.M.predict_noiseless(x)
+        (dmu, dvar) = self.M.predictive_gradients(x) # analytic gradients of the posterior mean and variance, the last column is the task index
+
+        return (mu, var, dmu[:,:-1,0], dvar[:,:-1])
+
+    def snapshot(self):
+
+        if len(self.M_stacked) > 0 or self.M is None or self.mf is not None: # M_last is the model of the previous train(), only used by predict_last
+            return None
+        return Model_GPy_Snapshot(self)
+
     def predict_last(self, points : Collection[np.ndarray], tid : int, **kwargs) -> Collection[Tuple[float, float]]:
 
-        x = np.empty((1, points.shape[0] + 1))
-        x[0,:-1] = points
-        x[0,-1] = tid
+        points = np.array(points, ndmin=2) # one point or a batch of points, one per row
+        x = np.empty((points.shape[0], points.shape[1] + 1))
+        x[:,:-1] = points
+        x[:,-1] = tid
         if self.M_last != None:
             (mu, var) = self.M_last.predict_noiseless(x)
         else:
@@ -1287,12 +1405,33 @@ class Model_LCM(Model):
 
         return (mu, var)
 
+    def predict_gradients(self, points : np.ndarray, tid : int, **kwargs) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+
+        if len(self.M_stacked) > 0 or self.mf is not None: # the gradient of the mean function is not available
+            return super().predict_gradients(points, tid, **kwargs)
+
+        points = np.array(points, ndmin=2, dtype=float)
+        x = np.empty((points.shape[0], points.shape[1] + 1))
+        x[:,:-1] = points
+        x[:,-1] = tid
+        (mu, var) = self.M.predict_noiseless(x)
+        (dmu, dvar) = self.M.predictive_gradients(x) # uses LCM.gradients_X, the last column is the task index
+
+        return (mu, var, dmu[:,:-1,0], dvar[:,:-1])
+
+    def snapshot(self):
+
+        if len(self.M_stacked) > 0 or self.M is None or self.mf is not None: # M_last is the model of the previous train(), only used by predict_last
+            return None
+        return Model_GPy_Snapshot(self)
+
     # make prediction on a single sample point of a specific task tid
     def predict_last(self, points : Collection[np.ndarray], tid : int, **kwargs) -> Collection[Tuple[float, float]]:
 
-        x = np.empty((1, points.shape[0] + 1))
-        x[0,:-1] = points
-        x[0,-1] = tid
+        points = np.array(points, ndmin=2) # one point or a batch of points, one per row
+        x = np.empty((points.shape[0], points.shape[1] + 1))
+        x[:,:-1] = points
+        x[:,-1] = tid
         if self.M_last != None:
             (mu, var) = self.M_last.predict_noiseless(x)   # predict_noiseless ueses precomputed Kinv and Kinv*y (generated at GPCoregionalizedRegression init, which calls inference in GPy/inference/latent_function_inference/exact_gaussian_inference.py) to compute mu and var, with O(N^2) complexity, see "class PosteriorExact(Posterior): _raw_predict" of GPy/inference/latent_function_inference/posterior.py.
         else:
@@ -1318,6 +1457,394 @@ class Model_LCM(Model):
 
         return
 
+class Model_GPy_Snapshot(Model):
+
+    """ Prediction-only copy of a trained GPy model with exact inference (Model_GPy_LCM, Model_LCM): the kernel, the training inputs, the Woodbury vector and the Cholesky factor of the training covariance.
+    The arrays are held in shared memory, so the processes running the search receive them without copies """
+
+    def __init__(self, model : Model):
+
+        super().__init__(model.problem, None)
+        self.kern = model.M.kern.copy() # detached from the GPy model, so that it can be pickled
+        likelihoods = getattr(model.M.likelihood, 'likelihoods_list', [model.M.likelihood]) # one Gaussian likelihood per task, or a single one for GPRegression
+        self.noise = np.array([likelihood.variance.values[0] for likelihood in likelihoods]) + 1e-8 # as added to the diagonal of the training covariance by GPy's ExactGaussianInference
+        self.X = SharedArray(np.asarray(model.M.X))
+        self.woodbury_vector = SharedArray(np.asarray(model.M.posterior.woodbury_vector))
+        self.woodbury_chol = SharedArray(np.asarray(model.M.posterior.woodbury_chol))
+
+    def train(self, data : Data, **kwargs):
+
+        raise Exception("A model snapshot cannot be trained")
+
+    def train_stacked(self, data : Data, num_source_tasks, **kwargs):
+
+        raise Exception("A model snapshot cannot be trained")
+
+    def update(self, newdata : Data, do_train: bool = False, **kwargs):
+
+        raise Exception("A model snapshot cannot be trained")
+
+    def predict(self, points : Collection[np.ndarray], tid : int, full_cov : bool=False, **kwargs) -> Collection[Tuple[float, float]]:
+
+        points = np.atleast_2d(points)
+        x = np.empty((points.shape[0], points.shape[1] + 1))
+        x[:,:-1] = points
+        x[:,-1] = tid
+        Kx = self.kern.K(x, self.X.array)
+        mu = np.dot(Kx, self.woodbury_vector.array)
+        tmp = scipy.linalg.solve_triangular(self.woodbury_chol.array, Kx.T, lower=True) # same as predict_noiseless, see "class PosteriorExact(Posterior): _raw_predict" of GPy/inference/latent_function_inference/posterior.py
+        if (full_cov):
+            var = self.kern.K(x) - np.dot(tmp.T, tmp)
+        else:
+            var = (self.kern.Kdiag(x) - np.sum(np.square(tmp), axis=0))[:, np.newaxis]
+
+        return (mu, var)
+
+    def predict_last(self, points : Collection[np.ndarray], tid : int, **kwargs) -> Collection[Tuple[float, float]]:
+
+        return self.predict(np.array(points, ndmin=2), tid)
+
+    def predict_gradients(self, points : np.ndarray, tid : int, **kwargs) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+
+        points = np.array(points, ndmin=2, dtype=float)
+        x = np.empty((points.shape[0], points.shape[1] + 1))
+        x[:,:-1] = points
+        x[:,-1] = tid
+        Kx = self.kern.K(x, self.X.array)
+        mu = np.dot(Kx, self.woodbury_vector.array)
+        tmp = scipy.linalg.solve_triangular(self.woodbury_chol.array, Kx.T, lower=True)
+        var = (self.kern.Kdiag(x) - np.sum(np.square(tmp), axis=0))[:, np.newaxis]
+        # same as GPy predictive_gradients, with the Woodbury inverse applied through the Cholesky factor
+        alpha = -2. * scipy.linalg.solve_triangular(self.woodbury_chol.array, tmp, lower=True, trans='T').T
+        dmu = self.kern.gradients_X(self.woodbury_vector.array.T, x, self.X.array)
+        dvar = self.kern.gradients_X_diag(np.ones(x.shape[0]), x) + self.kern.gradients_X(alpha, x, self.X.array)
+
+        return (mu, var, dmu[:,:-1], dvar[:,:-1])
+
+    def fantasize(self, points : np.ndarray, values : np.ndarray, tids : Collection[int]):
+
+        # appends the points to the training inputs in place, in O(n^2) instead of refactorizing the training covariance
+        points = np.array(points, ndmin=2, dtype=float)
+        tids = np.array(tids, ndmin=1, dtype=int)
+        x = np.empty((points.shape[0], points.shape[1] + 1))
+        x[:,:-1] = points
+        x[:,-1] = tids
+        x = x[:,:self.X.shape[1]] # no task column for GPRegression
+        X = self.X.array
+        L = self.woodbury_chol.array
+        y = np.dot(L, np.dot(L.T, self.woodbury_vector.array)) # training outputs, woodbury_vector = (L L^T)^-1 y
+        L12 = scipy.linalg.solve_triangular(L, self.kern.K(X, x), lower=True)
+        K22 = self.kern.K(x) + np.diag(self.noise[tids if len(self.noise) > 1 else np.zeros_like(tids)])
+        L22 = GPy.util.linalg.jitchol(K22 - np.dot(L12.T, L12))
+        (n, k) = L12.shape
+        L_new = np.zeros((n + k, n + k))
+        L_new[:n,:n] = L
+        L_new[n:,:n] = L12.T
+        L_new[n:,n:] = L22
+        y = np.vstack((y, np.array(values, dtype=float).reshape(-1, 1)))
+        woodbury_vector = scipy.linalg.cho_solve((L_new, True), y)
+        X_new = np.vstack((X, x))
+
+        del X, L # views of the shared memory blocks, which are released by close
+        self.close()
+        self.X = SharedArray(X_new)
+        self.woodbury_vector = SharedArray(woodbury_vector)
+        self.woodbury_chol = SharedArray(L_new)
+
+        return self
+
+    def kernel_components(self):
+
+        # the kernel as a sum of stationary components, each one a tuple (B, variance, lengthscale, nu) standing for B[t,t'] variance k_nu(|x-x'|/lengthscale) between the tasks t and t', with k_nu the Matern kernel of smoothness nu (None: squared exponential)
+        # None for the kernels that are not supported
+        if hasattr(self.kern, 'BS'): # lcm.LCM of Model_LCM
+            (Q, T, D) = (self.kern.Q, self.kern.num_outputs, self.kern.input_dim - 1)
+            return [(self.kern.BS[q*T*T:(q+1)*T*T].reshape(T, T).copy(), self.kern.var[q], self.kern.theta[q*D:(q+1)*D].copy(), None) for q in range(Q)]
+
+        nus = {GPy.kern.RBF: None, GPy.kern.Exponential: 0.5, GPy.kern.Matern32: 1.5, GPy.kern.Matern52: 2.5}
+        components = []
+        for part in (self.kern.parts if isinstance(self.kern, GPy.kern.Add) else [self.kern]): # GPy LCM: sum of products of a stationary kernel and a Coregionalize kernel
+            factors = part.parts if isinstance(part, GPy.kern.Prod) else [part]
+            B = [factor.B for factor in factors if isinstance(factor, GPy.kern.Coregionalize)]
+            factors = [factor for factor in factors if not isinstance(factor, GPy.kern.Coregionalize)]
+            if (len(factors) != 1 or type(factors[0]) not in nus):
+                return None
+            k = factors[0]
+            lengthscale = np.array(np.broadcast_to(np.asarray(k.lengthscale.values, dtype=float), (k.input_dim,)))
+            components.append((np.array(B[0]) if len(B) > 0 else np.ones((1, 1)), k.variance.values[0], lengthscale, nus[type(k)]))
+        return components
+
+    def export_predictor(self):
+
+        components = self.kernel_components()
+        if (components is None):
+            return None
+        return Model_Predictor(self.problem, components, np.array(self.X.array), np.array(self.woodbury_vector.array), np.array(self.woodbury_chol.array), self.noise)
+
+    def thompson_sample(self, n_features : int, seed : int = None):
+
+        predictor = self.export_predictor()
+        if (predictor is None):
+            return None
+        return predictor.thompson_sample(n_features, seed)
+
+    def close(self):
+
+        for array in [self.X, self.woodbury_vector, self.woodbury_chol]:
+            array.close()
+
+
+class Model_Predictor(Model):
+
+    """ Frozen GP predictor in NumPy (Model.export_predictor): the kernel components (see Model_GPy_Snapshot.kernel_components), the training inputs, alpha = (K + noise)^-1 y and the Cholesky factor of K + noise.
+    mean_var predicts a batch of points without the overhead of the GPy parameter framework, and the object pickles as a few arrays """
+
+    def __init__(self, problem : Problem, components, X : np.ndarray, alpha : np.ndarray, chol : np.ndarray, noise : np.ndarray):
+
+        super().__init__(problem, None)
+        self.components = components
+        self.D = len(components[0][2]) # number of parameters seen by the kernel
+        self.X = X[:,:self.D]
+        self.tids = X[:,self.D].astype(int) if X.shape[1] > self.D else np.zeros(len(X), dtype=int)
+        self.alpha = alpha
+        self.chol = chol
+        self.noise = noise
+
+    def train(self, data : Data, **kwargs):
+
+        raise Exception("A predictor cannot be trained")
+
+    def train_stacked(self, data : Data, num_source_tasks, **kwargs):
+
+        raise Exception("A predictor cannot be trained")
+
+    def update(self, newdata : Data, do_train: bool = False, **kwargs):
+
+        raise Exception("A predictor cannot be trained")
+
+    def K(self, X1 : np.ndarray, tids1 : np.ndarray, X2 : np.ndarray, tids2 : np.ndarray) -> np.ndarray:
+
+        K = np.zeros((len(X1), len(X2)))
+        for (B, variance, lengthscale, nu) in self.components:
+            A1 = X1/lengthscale
+            A2 = X2/lengthscale
+            r2 = np.maximum(np.sum(A1**2, axis=1)[:,np.newaxis] + np.sum(A2**2, axis=1)[np.newaxis,:] - 2*np.dot(A1, A2.T), 0.)
+            if (nu is None):
+                k = np.exp(-0.5*r2)
+            else:
+                r = np.sqrt(r2)
+                if (nu == 0.5):
+                    k = np.exp(-r)
+                elif (nu == 1.5):
+                    k = (1. + np.sqrt(3.)*r)*np.exp(-np.sqrt(3.)*r)
+                else:
+                    k = (1. + np.sqrt(5.)*r + 5./3.*r2)*np.exp(-np.sqrt(5.)*r)
+            K += B[np.ix_(tids1 % len(B), tids2 % len(B))]*variance*k
+        return K
+
+    def mean_var(self, X : np.ndarray, tid, full_cov : bool=False) -> Tuple[np.ndarray, np.ndarray]:
+
+        # posterior mean and variance (or covariance) at the rows of X for task tid, as predict_noiseless. tid is a task index or an array of task indices, one per row of X (see PredictorBatch)
+        X = np.array(X, ndmin=2, dtype=float)[:,:self.D]
+        tids = np.broadcast_to(np.asarray(tid, dtype=int), (len(X),))
+        Kx = self.K(X, tids, self.X, self.tids)
+        mu = np.dot(Kx, self.alpha)
+        tmp = scipy.linalg.solve_triangular(self.chol, Kx.T, lower=True)
+        if (full_cov):
+            var = self.K(X, tids, X, tids) - np.dot(tmp.T, tmp)
+        else:
+            var = (sum(np.diag(B)[tids % len(B)]*variance for (B, variance, lengthscale, nu) in self.components) - np.sum(np.square(tmp), axis=0))[:, np.newaxis]
+        return (mu, var)
+
+    def cross_cov(self, X1 : np.ndarray, X2 : np.ndarray, tid : int, cache : dict = None) -> Tuple[np.ndarray, np.ndarray]:
+
+        # posterior variance at the rows of X1 and posterior covariance between the rows of X1 and X2 for task tid, without the covariance among the rows of X1
+        # cache, if given, keeps (K(X, X) + noise)^-1 K(X, X2) across the calls with the same X2, a row of X1 then costs O(n^2 + n len(X2)) for n training points
+        X1 = np.array(X1, ndmin=2, dtype=float)[:,:self.D]
+        X2 = np.array(X2, ndmin=2, dtype=float)[:,:self.D]
+        tids1 = np.full(len(X1), tid, dtype=int)
+        tids2 = np.full(len(X2), tid, dtype=int)
+        if (cache is None or 'W' not in cache):
+            W = scipy.linalg.cho_solve((self.chol, True), self.K(self.X, self.tids, X2, tids2))
+            if (cache is not None):
+                cache['W'] = W
+        else:
+            W = cache['W']
+        Kx = self.K(X1, tids1, self.X, self.tids)
+        tmp = scipy.linalg.solve_triangular(self.chol, Kx.T, lower=True)
+        var = (sum(np.diag(B)[tids1 % len(B)]*variance for (B, variance, lengthscale, nu) in self.components) - np.sum(np.square(tmp), axis=0))[:, np.newaxis]
+        return (var, self.K(X1, tids1, X2, tids2) - np.dot(Kx, W))
+
+    def predict(self, points : Collection[np.ndarray], tid : int, full_cov : bool=False, **kwargs) -> Collection[Tuple[float, float]]:
+
+        return self.mean_var(points, tid, full_cov)
+
+    def predict_last(self, points : Collection[np.ndarray], tid : int, **kwargs) -> Collection[Tuple[float, float]]:
+
+        return self.mean_var(points, tid)
+
+    def thompson_sample(self, n_features : int, seed : int = None):
+
+        rng = np.random.RandomState(seed)
+
+        # prior draw: sum over the components of random Fourier features (frequencies drawn from the spectral density, Student-t for the Matern kernels) times task weights of covariance B
+        features = []
+        for (B, variance, lengthscale, nu) in self.components:
+            z = rng.randn(n_features, len(lengthscale))
+            if (nu is not None):
+                z *= np.sqrt(2*nu/rng.chisquare(2*nu, size=(n_features, 1)))
+            (eigval, eigvec) = np.linalg.eigh(B)
+            weights = np.dot(rng.randn(n_features, len(B)), (eigvec*np.sqrt(np.maximum(eigval, 0.))).T) # rows of covariance B
+            features.append((z/lengthscale, rng.uniform(0., 2*np.pi, n_features), np.sqrt(2*variance/n_features)*weights))
+
+        # pathwise update of the prior draw with the exact kernel
+        sample = Model_ThompsonSample(self.problem, self, features, None)
+        y = np.dot(self.chol, np.dot(self.chol.T, self.alpha)) # training outputs, alpha = (L L^T)^-1 y
+        eps = rng.randn(len(self.X), 1)*np.sqrt(self.noise[self.tids % len(self.noise)]).reshape(-1, 1)
+        sample.v = scipy.linalg.cho_solve((self.chol, True), y - sample.prior(self.X, self.tids) - eps)
+
+        return sample
+
+
+class PredictorBatch(object):
+
+    """ Joint predictions of a Model_Predictor for the concurrent searches of several tasks (search_multitask_joint): a search asking for predictions waits for the other searches,
+    then the points of all the tasks are predicted by one call of Model_Predictor.mean_var, their rows stacked with their task indices, so that the kernel with the training points and the triangular solve are computed once per generation.
+    Each search registers with register(tid) before its first prediction and unregisters with finish(tid) once it is over. The pending points are predicted as soon as every registered search has a pending prediction, so a search never waits for a search that is over """
+
+    def __init__(self, predictor : Model_Predictor):
+
+        self.predictor = predictor
+        self.active = set() # tasks of the registered searches
+        self.pending = [] # [points, tid, result] of the waiting predictions
+        self.condition = threading.Condition()
+
+    def __deepcopy__(self, memo):   # the optimizers (e.g. pygmo) deep copy the problem, and with it the models, for each island or population: the copies must keep predicting through this batch, as the other searches wait for their points
+
+        return self
+
+    def flush(self):   # called with the condition held
+
+        (requests, self.pending) = (self.pending, [])
+        try:
+            (mu, var) = self.predictor.mean_var(np.vstack([request[0] for request in requests]), np.concatenate([np.full(len(request[0]), request[1]) for request in requests]))
+            k = 0
+            for request in requests:
+                request[2] = (mu[k:k+len(request[0])], var[k:k+len(request[0])])
+                k += len(request[0])
+        except Exception as inst:
+            for request in requests:
+                request[2] = inst
+        self.condition.notify_all()
+
+    def ready(self):   # called with the condition held, whether every registered search has a pending prediction (the islands of one search may have several)
+
+        return len(self.pending) > 0 and self.active <= set(request[1] for request in self.pending)
+
+    def register(self, tid : int):
+
+        with self.condition:
+            self.active.add(tid)
+
+    def finish(self, tid : int):   # the search of task tid is over, the other searches stop waiting for it
+
+        with self.condition:
+            self.active.discard(tid)
+            if (self.ready()):
+                self.flush()
+
+    def mean_var(self, points : np.ndarray, tid : int) -> Tuple[np.ndarray, np.ndarray]:
+
+        request = [np.array(points, ndmin=2, dtype=float), tid, None]
+        with self.condition:
+            self.pending.append(request)
+            if (self.ready()):
+                self.flush()
+            else:
+                self.condition.wait_for(lambda: request[2] is not None)
+        if (isinstance(request[2], Exception)):
+            raise request[2]
+        return request[2]
+
+
+class Model_PredictorTask(Model):
+
+    """ Model seen by the search of one task in the joint mode (search_multitask_joint), predicting through the PredictorBatch shared by the searches of all the tasks """
+
+    def __init__(self, problem : Problem, batch : PredictorBatch):
+
+        super().__init__(problem, None)
+        self.batch = batch
+
+    def train(self, data : Data, **kwargs):
+
+        raise Exception("A predictor cannot be trained")
+
+    def train_stacked(self, data : Data, num_source_tasks, **kwargs):
+
+        raise Exception("A predictor cannot be trained")
+
+    def update(self, newdata : Data, do_train: bool = False, **kwargs):
+
+        raise Exception("A predictor cannot be trained")
+
+    def predict(self, points : Collection[np.ndarray], tid : int, full_cov : bool=False, **kwargs) -> Collection[Tuple[float, float]]:
+
+        if (full_cov): # the joint covariance of the points of one task is not batched
+            return self.batch.predictor.mean_var(points, tid, full_cov)
+        return self.batch.mean_var(points, tid)
+
+    def predict_last(self, points : Collection[np.ndarray], tid : int, **kwargs) -> Collection[Tuple[float, float]]:
+
+        return self.predict(points, tid)
+
+
+class Model_ThompsonSample(Model):
+
+    """ Function drawn from the posterior of a GP model (Model_Predictor.thompson_sample), to be minimized in place of an acquisition function (search_af='TS'): a draw from the prior approximated with random Fourier features, updated by pathwise conditioning on the training data
+    f(x) = f_prior(x) + K(x, X) (K(X, X) + noise)^-1 (y - f_prior(X) - eps), eps ~ N(0, noise), so that a point costs O(n_features + n) without factorization.
+    predict returns the value of the function and a zero variance """
+
+    def __init__(self, problem : Problem, predictor : Model_Predictor, features, v : np.ndarray):
+
+        super().__init__(problem, None)
+        self.predictor = predictor
+        self.features = features # [frequencies, phases, task weights] of each component of the kernel
+        self.v = v
+
+    def train(self, data : Data, **kwargs):
+
+        raise Exception("A posterior sample cannot be trained")
+
+    def train_stacked(self, data : Data, num_source_tasks, **kwargs):
+
+        raise Exception("A posterior sample cannot be trained")
+
+    def update(self, newdata : Data, do_train: bool = False, **kwargs):
+
+        raise Exception("A posterior sample cannot be trained")
+
+    def prior(self, x : np.ndarray, tids : np.ndarray) -> np.ndarray:
+
+        f = np.zeros(len(x))
+        for (W, b, weights) in self.features:
+            f += np.sum(np.cos(np.dot(x, W.T) + b)*weights[:,tids % weights.shape[1]].T, axis=1)
+        return f.reshape(-1, 1)
+
+    def predict(self, points : Collection[np.ndarray], tid : int, full_cov : bool=False, **kwargs) -> Collection[Tuple[float, float]]:
+
+        x = np.array(points, ndmin=2, dtype=float)[:,:self.predictor.D]
+        tids = np.full(len(x), tid)
+        f = self.prior(x, tids) + np.dot(self.predictor.K(x, tids, self.predictor.X, self.predictor.tids), self.v)
+        var = np.zeros((len(x), len(x))) if full_cov else np.zeros((len(x), 1))
+
+        return (f, var)
+
+    def predict_last(self, points : Collection[np.ndarray], tid : int, **kwargs) -> Collection[Tuple[float, float]]:
+
+        return self.predict(np.array(points, ndmin=2), tid)
+
+
 class Model_George(Model):
     y = []
 
@@ -89,29 +89,63 @@ class Options(dict):
 
 
         """ Options for the search phase """
-        search_class = 'SearchPyGMO' # Supported searcher classes: 'SearchPyGMO', 'SearchCMO', 'SearchSciPy', 'SearchPyMoo' 
+        search_class = 'SearchPyGMO' # Supported searcher classes: 'SearchPyGMO', 'SearchCMO', 'SearchSciPy', 'SearchPyMoo', 'SearchMultiStart', 'SearchTrustRegion', 'SearchMixedInteger'
         search_threads = None  # Number of threads in each thread group handling one task
         search_processes = 1  # Reserved option
         search_multitask_threads = None # Number of threads groups each handling one task
         search_multitask_processes = None # Number of MPIs each handling one task
+        search_multitask_executor = 'thread' # Executor used by shared_memory_parallelism for the search of multiple tasks: 'thread' -- pool of search_multitask_threads threads, 'process' -- persistent pool of search_multitask_threads processes receiving the models through shared memory (shut down at exit or by search.shutdown_executors)
+        search_multitask_joint = False # Search all the tasks together, one thread per task, predicting the populations of all the tasks with one call of the model sharing its factorization (requires search_predictor and a model exported by Model.export_predictor; not with distributed_memory_parallelism or search_af='TS')
         search_algo = 'pso' # Supported search algorithms:
             # 'SearchPyGMO' or 'SearchCMO': single-objective: 'pso' -- particle swarm, 'cmaes' -- covariance matrix adaptation evolution. multi-objective 'nsga2' -- Non-dominated Sorting GA, 'nspso' -- Non-dominated Sorting PSO, 'maco' -- Multi-objective Hypervolume-based ACO, 'moead' -- Multi-objective EA vith Decomposition. 
 
+            # 'SearchCMO' with search_cmo_pymoo: 'pso' -- particle swarm, 'ga' -- genetic algorithm (single objective, the bounds of the output space are constraints)
+
             # 'SearchSciPy': single-objective: 'l-bfgs-b', 'dual_annealing', 'trust-constr', 'shgo'
 
             # 'SearchPyMoo': single-objective: 'pso' -- particle swarm, 'ga' -- genetic algorithm. multi-objective 'nsga2' -- Non-dominated Sorting GA, 'moead' -- Multi-objective EA vith Decomposition. 
 
-        search_udi = 'thread_island' # Supported UDI options for pgymo: 'thread_island' --Thread island, 'ipyparallel_island' --Ipyparallel island
+            # 'SearchMultiStart': single-objective only, search_algo is ignored. L-BFGS-B started from the search_multistart_starts best of search_pop_size random points, for at most search_gen iterations
+
+            # 'SearchTrustRegion': single-objective only, search_algo is ignored. search_pop_size candidates in a trust region around the best sample of each task, see the search_tr_* options
+
+            # 'SearchMixedInteger': single-objective only, search_algo is ignored. Genetic algorithm of population search_pop_size on the integer and categorical values, for at most search_gen generations, see the search_mixed_* options
+
+        search_udi = 'thread_island' # Supported UDI options for pgymo: 'thread_island' --Thread island, 'ipyparallel_island' --Ipyparallel island, 'mp_island' --Multiprocessing island, 'process_island' --Each of the search_threads islands evolves in its own persistent process receiving the surrogate problem once per search (SearchProcessIsland), it evolves the Python surrogate problem that 'thread_island' rejects as not thread safe. The driver must guard its main code with if __name__ == "__main__"
         search_pop_size = 1000 # Population size in pgymo or pymoo
         search_gen = 100  # Number of evolution generations in pgymo or pymoo
         search_evolve = 10  # Number of times migration in pgymo 
         search_max_iters = 10  # Max number of searches to get results respecting the constraints
+        search_time_budget = None # Wall-clock target in seconds of the search phase of an MLA iteration (all the tasks). If set, search_pop_size and search_gen are chosen by the searcher from the dimension of the parameter space and the measured cost of the acquisition function (Search.adapt_budget), and reported in stats['search_budget']
         search_more_samples = 1  # Maximum number of points selected using a multi-objective search algorithm or single-objective search with q-EI/q-UCB 
         search_random_seed = None # Specify a certain random seed for the search phase
-        search_af='EI' #acquisition function: EI, UCB, MSPE, UCB-HVI. MSPE: min-square-prediction-error as implemented in cGP. UCB-HVI: a variant of hypervolume improvement implemented in Accelerator_MOBO. q-UCB: multi-point UCB function in the paper "The reparameterization trick for acquisition functions", 2017. q-EI: multi-point EI function in the paper "The reparameterization trick for acquisition functions", 2017 
+        search_af='EI' #acquisition function: EI, UCB, MSPE, UCB-HVI. MSPE: min-square-prediction-error as implemented in cGP. UCB-HVI: a variant of hypervolume improvement implemented in Accelerator_MOBO. q-UCB: multi-point UCB function in the paper "The reparameterization trick for acquisition functions", 2017. q-EI: multi-point EI function in the paper "The reparameterization trick for acquisition functions", 2017. TS: Thompson sampling, minimizes a posterior draw of the model, see search_ts_features 
+        search_ts_features = 1024 # Number of random Fourier features of the posterior draws used as acquisition functions with search_af='TS' (Thompson sampling, Model_GPy_LCM or Model_LCM models)
+        search_predictor = True # Whether the search predicts with NumPy copies of the trained models (Model.export_predictor, Model_GPy_LCM or Model_LCM models with RBF or Matern kernels), freezing the training data, hyperparameters and Cholesky factor, instead of calling the models. The models that cannot be exported (export_predictor returns None, e.g. stacked models or models with a mean function) are called as before
         search_ucb_beta=0.01 #hyperparameter beta in UCB, UCB-HVI and q-UCB
+        search_hvi_max_cells = 1e7 # Maximum size of the grid ((Pareto front size+1)^(DO-1)*Pareto front size) of the box decomposition used by UCB-HVI to compute the hypervolume improvements of a whole population at once, beyond which they are computed point by point with pygmo.hypervolume
         search_ei_alpha=0.0  #hyperparameter beta in EI, q-EI
         search_bigval=1e12 # return this value when the input constraint is not respected during the search phase
+        search_cmo_pymoo = False # Whether 'SearchCMO' searches with pymoo instead of pygmo: the objective is the product of the inverse predicted outputs and the bounds of the output space are inequality constraints, evaluated for the whole population at once (MyProblemPyMooCMO)
+        search_batch_fitness = False # Whether pgymo evaluates the acquisition function for a whole population at once (SurrogateProblem.batch_fitness, SurrogateProblemCMO.batch_fitness). Only the algorithms with a batch fitness evaluator (set_bfe) use it: 'pso', which has none, is replaced by its generational variant 'pso_gen' (a different update rule, hence different iterates), and the other algorithms without one (e.g. 'de', 'sade', 'moead') evaluate point by point. Options.validate prints a warning in both cases
+        search_warm_start = False # Whether 'SearchPyGMO' and 'SearchCMO' (pygmo) start the search of each task from the individuals kept from its previous search (MLA iteration), completed with random individuals. This allows for smaller search_gen and search_evolve
+        search_warm_start_fraction = 0.25 # Fraction of each population of 'SearchPyGMO' and 'SearchCMO' taken from the previous search of the task with search_warm_start: its champion and a diverse subset of its best individuals
+        search_batch_size = 1 # Number of searches per task and MLA iteration (GPTune.MLA_), the surrogate models (Model_GPy_LCM or Model_LCM without model stacking or mean function) being updated with fantasized outputs at the points proposed by the previous searches, without retraining. Typically the number of parallel objective evaluations
+        search_batch_lie = 'believer' # Fantasized outputs with search_batch_size>1: 'believer' -- posterior mean of the model (kriging believer), 'min', 'max', 'mean' -- constant liar, minimum, maximum or mean of the outputs of the task
+        search_stall_rounds = None # Number of consecutive evolve rounds ('SearchPyGMO', single objective) or generations ('SearchPyMoo', single objective) without improvement of the best acquisition function value after which the search stops early, None: no early termination
+        search_stall_tol = 1e-4 # Relative improvement of the best acquisition function value below which a round counts towards search_stall_rounds
+        search_bounds_topk = None # If set, the searches of 'SearchPyGMO', 'SearchPyMoo' and 'SearchCMO' for a task with at least search_bounds_min_samples samples are restricted to the bounding box of its search_bounds_topk best samples (of its Pareto front for multi-objective problems) widened by search_bounds_margin, None: the whole normalized parameter space
+        search_bounds_margin = 0.1 # Margin added on each side of the bounding box of the best samples with search_bounds_topk, in the normalized parameter space
+        search_bounds_min_samples = 100 # Number of samples of a task from which its searches are restricted with search_bounds_topk
+        search_bounds_sweep = 5 # With search_bounds_topk, the searches of a task whose number of samples is a multiple of search_bounds_sweep still cover the whole parameter space, None: never
+        search_mixed_enum_max = 64 # 'SearchMixedInteger' evolves one sub-population per combination of the categorical parameters when there are at most search_mixed_enum_max combinations
+        search_mixed_sigma = 0.1 # Standard deviation of the mutations of 'SearchMixedInteger' in the normalized space, the integer parameters move by at least one value
+        search_multistart_starts = 20 # Number of L-BFGS-B starting points in 'SearchMultiStart'
+        search_tr_length_init = 0.8 # Initial side length of the trust regions of 'SearchTrustRegion' in the normalized parameter space
+        search_tr_length_min = 0.5**7 # The trust region is reset to search_tr_length_init when its side length gets below this value
+        search_tr_length_max = 1.6 # Maximal side length of the trust regions
+        search_tr_success_tol = 3 # Number of consecutive improvements of the best sample after which the trust region is expanded
+        search_tr_failure_tol = None # Number of consecutive searches without improvement after which the trust region is shrunk, None: max(4, DP)
 
         """ Options for transfer learning """
         TLA_method = 'LCM' #None #'Regression' #"LCM_BF" #'Sum' #'Stacking' #'regression_weights_no_scale'
@@ -187,8 +221,6 @@ class Options(dict):
             self['search_multitask_processes']=1
             self['search_threads']=1
             self['search_more_samples']=1
-            self['search_gen']=5      # needs to be smaller than default, otherwise pymoo is very slow
-            self['search_pop_size']=100
 
             # use 'SearchSciPy' to replace 'SearchPyGMO' if single-objective and if `PyGMO' is not properly loaded
             # use 'SearchPyMoo' to replace 'SearchPyGMO' if multi-objective and if 'PyGMO' is  not properly loaded
@@ -218,8 +250,6 @@ class Options(dict):
                 if importlib.util.find_spec("pygmo") is None:
                     print ("PyGMO module cannot be loaded properly. Use PyMoo (SearchPyMoo) instead.")
                     self['search_class']='SearchPyMoo'
-                    self['search_gen']=5      # needs to be smaller than default, otherwise pymoo is very slow
-                    self['search_pop_size']=100                    
                     if(self["search_algo"] == 'l-bfgs-b' or self["search_algo"] == 'cmaes' or self["search_algo"] == 'dual_annealing' or self["search_algo"] == 'trust-constr' or self["search_algo"] == 'shgo'):
                         self["search_algo"] == 'pso'
                     if(self["search_algo"] == 'nspso' or self["search_algo"] == 'maco'):
@@ -366,5 +396,14 @@ class Options(dict):
                     raise Exception("Reduce one of the options: search_multitask_processes,search_multitask_threads,search_processes,search_threads")
                 if ((computer.cores*computer.nodes)<ncore_obj):
                     raise Exception("Reduce one of the options: objective_multisample_processes,objective_multisample_threads,objective_nprocmax")
+
+        if (self['search_batch_fitness'] and (self['search_class']=='SearchPyGMO' or self['search_class']=='SearchCMO') and importlib.util.find_spec("pygmo") is not None):
+            import pygmo as pg
+            search_algo = self['search_algo']
+            if (search_algo == 'pso'):
+                print("Warning: search_batch_fitness replaces the pygmo algorithm 'pso' by its generational variant 'pso_gen', whose iterates differ")
+                search_algo = 'pso_gen'
+            if (hasattr(pg, search_algo) and not hasattr(getattr(pg, search_algo), 'set_bfe')):
+                print("Warning: the pygmo algorithm '%s' has no batch fitness evaluator, search_batch_fitness has no effect and the acquisition function is evaluated point by point"%(search_algo))
         pp = pprint.PrettyPrinter(indent=2)
         pp.pprint(self)
@@ -17,6 +17,9 @@
 
 from autotune.problem import TuningProblem
 import copy
+import sys
+import importlib
+from pathlib import Path
 
 class Problem(object):
 
@@ -36,6 +39,31 @@ class Problem(object):
         self.input_var      = tp.input_var
         self.constants      = tp.constants        
 
+        self._driver_module      = None # driver module imported from driverabspath, resolved once per process
+        self._driver_module_path = None
+
+    def __getstate__(self):
+
+        # modules cannot be pickled, processes receiving the problem (e.g. spawned by Computer.spawn) import the driver again on first use
+        state = self.__dict__.copy()
+        state['_driver_module'] = None
+        state['_driver_module_path'] = None
+        return state
+
+    def driver_module(self):
+
+        """ Return the driver module located at driverabspath (None if driverabspath is not set). The module is imported once per process and imported again if driverabspath changes """
+
+        if (self.driverabspath is None):
+            return None
+        if (getattr(self, '_driver_module', None) is None or self._driver_module_path != self.driverabspath):
+            modulename = Path(self.driverabspath).stem  # get the driver name excluding all directories and extensions
+            if (self.driverabspath not in sys.path):
+                sys.path.append(self.driverabspath) # add path to sys
+            self._driver_module = importlib.import_module(modulename) # import driver name as a module
+            self._driver_module_path = self.driverabspath
+        return self._driver_module
+
     @property
     def DI(self):
 
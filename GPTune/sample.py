@@ -57,13 +57,17 @@ class Sample(abc.ABC):
                 # t2 = time.time_ns()
                 # print('sample_para:',(t2-t1)/1e9)
 
-                for s_norm in S2:
-                    # print("jiji",s_norm)
-                    s_orig = space.inverse_transform(np.array(s_norm, ndmin=2))[0]
+                S2_orig = space.inverse_transform(np.array(S2, ndmin=2))
+                points = []
+                for s_orig in S2_orig:
                     kwargs2 = {d.name: s_orig[i] for (i, d) in enumerate(space)}
                     # print("dfdfdfdfd",kwargs2)
                     kwargs2.update(check_constraints_kwargs)
-                    if (check_constraints(kwargs2)):
+                    points.append(kwargs2)
+                feasible = check_constraints(points) # one boolean per sample, the constraints are evaluated at once on all the samples
+
+                for (s_norm, cond) in zip(S2, feasible):
+                    if (cond):
                         S.append(s_norm)
                         cpt += 1
                         if (cpt >= n_samples):
@@ -118,33 +122,25 @@ class Sample(abc.ABC):
 
             xs = np.empty((0,0))
             repeat = 0
+            seen_elements = set() # configurations already sampled for this task in the original space
             while (len(xs) < n_samples):
                 gen_samples = n_samples - len(xs)
                 xs_ = self.sample_constrained(gen_samples, repeat, PS, check_constraints = check_constraints, check_constraints_kwargs = kwargs2, **kwargs) # result from the sampling module
-                
-                xs_orig = [problem.PS.inverse_transform(np.array([x], ndmin=2)) for x in xs]
-                xs_orig_ = [problem.PS.inverse_transform(np.array([x], ndmin=2)) for x in xs_]
-                xs_origs = xs_orig + xs_orig_
-                if(xs.shape[0]==0):
-                    xs = xs_
-                else:
-                    xs = np.vstack((xs, xs_))
 
-                seen_elements = set()
-                # List to store the indices of duplicates
-                duplicate_indices = []
-                for i, element in enumerate(xs_origs):
+                xs_orig_ = problem.PS.inverse_transform(np.array(xs_, ndmin=2))
+                # List to store the indices of the new samples that are not duplicates
+                unique_indices = []
+                for i, element in enumerate(xs_orig_):
                     # Convert lists to tuples to make them hashable
                     hashable_element = self.make_hashable(element)
-                    
-                    # If the element is already seen, record its index as duplicate
-                    if hashable_element in seen_elements:
-                        duplicate_indices.append(i)
-                    else:
-                        # Add the element to the set
+                    if hashable_element not in seen_elements:
                         seen_elements.add(hashable_element)
+                        unique_indices.append(i)
 
-                xs = np.delete(xs, duplicate_indices, axis=0)
+                if(xs.shape[0]==0):
+                    xs = xs_[unique_indices]
+                else:
+                    xs = np.vstack((xs, xs_[unique_indices]))
 
                 repeat += 1
 
@@ -18,20 +18,26 @@
 #
 import concurrent
 from concurrent import futures
+import atexit
 import sys
 import abc
 from typing import Collection
 import numpy as np
 import scipy as sp
+import scipy.stats
 import functools
+import itertools
+import time
+import skopt.space
 from joblib import *
 
 import copy
+import uuid
 from problem import Problem
 from computer import Computer
 from options import Options
-from data import Data
-from model import Model
+from data import Data, ParetoArchive
+from model import Model, Model_GPy_Snapshot, Model_ThompsonSample, Model_Predictor, Model_PredictorTask, PredictorBatch
 from sample import *
 
 from pathlib import Path
@@ -46,6 +52,12 @@ class Search(abc.ABC):
         self.computer = computer
         self.options = options
         self.models_transfer = models_transfer
+        self.warm_populations = {} # tid -> decision vectors kept from the final populations of the previous search of task tid, used with search_warm_start
+        self.search_terminations = {} # tid -> why the last search of task tid stopped, reported in stats['search_termination'] by the MLA
+        self.search_budget = {} # population size and number of generations chosen for the last searches with search_time_budget, reported in stats['search_budget'] by the MLA
+        self.search_budget_overhead = 1. # ratio of the measured to the predicted time of the last searches with search_time_budget, the cost of the acquisition function is corrected with it
+
+    task_state = ('warm_populations', 'search_terminations') # per-task state kept by the searcher across the searches, sent back by the search processes
 
     @abc.abstractmethod
     def search(self, data : Data, models : Collection[Model], tid : int, **kwargs) -> np.ndarray:
@@ -56,6 +68,15 @@ class Search(abc.ABC):
 
         if (tids is None):
             tids = list(range(data.NI))
+        if (i_am_manager):
+            self.search_terminations = {}
+            if (kwargs.get('search_predictor') and models is not None):   # predict with NumPy copies of the models, the models that cannot be exported are kept
+                predictors = [model.export_predictor() for model in models]
+                models = [predictor if predictor is not None else model for (predictor, model) in zip(predictors, models)]
+            self.search_budget = {}
+            if (kwargs.get('search_time_budget') is not None and models is not None and data.P is not None):
+                kwargs = self.adapt_budget(data, models, tids, kwargs)
+        t1 = time.time()
         flag=0
         for i in range(self.problem.DO):
             if models is not None and models[i].mf is not None:
@@ -79,15 +100,21 @@ class Search(abc.ABC):
                 res = res + tmpdata[p]
 
 
+        elif (kwargs['search_multitask_joint'] and len(tids) > 1 and kwargs['search_af'] != 'TS' and models is not None and all(isinstance(model, Model_Predictor) for model in models)):
+            res = self.search_multitask_joint(data, models, tids, kwargs)
+
         elif (kwargs['shared_memory_parallelism']):
-            #with concurrent.futures.ProcessPoolExecutor(max_workers = kwargs['search_multitask_threads']) as executor:
-            with concurrent.futures.ThreadPoolExecutor(max_workers = kwargs['search_multitask_threads']) as executor:
-                # fun = functools.partial(self.search, data = data, models = models, kwargs = kwargs)
-                # res = list(executor.map(fun, tids, timeout=None, chunksize=1))
-
-                def fun(tid):
-                    return self.search(data=data,models = models, tid =tid, kwargs = kwargs)
-                res = list(executor.map(fun, tids, timeout=None, chunksize=1))
+            res = None
+            if (kwargs['search_multitask_executor'] == 'process'):
+                res = self.search_multitask_process_pool(data, models, tids, kwargs)
+            if (res is None):
+                with concurrent.futures.ThreadPoolExecutor(max_workers = kwargs['search_multitask_threads']) as executor:
+                    # fun = functools.partial(self.search, data = data, models = models, kwargs = kwargs)
+                    # res = list(executor.map(fun, tids, timeout=None, chunksize=1))
+
+                    def fun(tid):
+                        return self.search(data=data,models = models, tid =tid, kwargs = kwargs)
+                    res = list(executor.map(fun, tids, timeout=None, chunksize=1))
         else:
             fun = functools.partial(self.search, data, models, kwargs = kwargs)
             res = list(map(fun, tids))
@@ -101,13 +128,9 @@ class Search(abc.ABC):
                 x = res_[1][0]
                 tmp = x
                 duplicate = False
-                for x_ in data.P[tid]:
-                    x_orig = self.problem.PS.inverse_transform(np.array(x, ndmin=2))[0]
-                    x_orig_ = self.problem.PS.inverse_transform(np.array(x_, ndmin=2))[0]
-                    if x_orig == x_orig_:
-                        duplicate = True
-                        print ("duplicated sample: ", x)
-                        break
+                if data.has_config(tid, self.problem.PS.inverse_transform(np.array(x, ndmin=2))[0]):
+                    duplicate = True
+                    print ("duplicated sample: ", x)
 
                 while duplicate == True:
                     duplicate = False
@@ -116,18 +139,425 @@ class Search(abc.ABC):
                     print ("generate random sample: ", x)
                     print ("generate random sample (orig): ", self.problem.PS.inverse_transform(np.array(x, ndmin=2))[0])
                     res_[1][0] = np.array([x.tolist()], ndmin=2)
-                    for x_ in data.P[tid]:
-                        x_orig = self.problem.PS.inverse_transform(np.array(x, ndmin=2))[0]
-                        x_orig_ = self.problem.PS.inverse_transform(np.array(x_, ndmin=2))[0]
-                        if x_orig == x_orig_:
-                            duplicate = True
-                            break
+                    if data.has_config(tid, self.problem.PS.inverse_transform(np.array(x, ndmin=2))[0]):
+                        duplicate = True
         res.sort(key = lambda x : x[0])
+        if (len(self.search_budget) > 0): # measured time, which includes the overhead of the optimizers, to correct the next budget
+            self.search_budget['elapsed'] = time.time() - t1
+            self.search_budget_overhead = float(np.clip(self.search_budget_overhead*self.search_budget['elapsed']/self.search_budget['predicted'], 0.1, 100.))
         return res
 
+    def search_rounds(self, kwargs : dict) -> int:
+
+        # number of times a search runs search_gen generations of a population
+        return 1
+
+    def adapt_budget(self, data : Data, models : Collection[Model], tids : Collection[int], kwargs : dict) -> dict:
+
+        """ Sizes the population and the number of generations of the searches of the tasks tids to fit the wall-clock target search_time_budget (seconds for the searches of all the tasks).
+        The population grows with the dimension of the parameter space, the number of generations follows from the cost of one generation, measured by evaluating the acquisition function of the first task on a random population (this cost grows with the number of training points),
+        and corrected by the ratio of the measured to the predicted time of the previous searches. Returns kwargs with the new search_pop_size and search_gen, the decision is kept in self.search_budget """
+
+        (pop_min, pop_max) = (20, 400)
+        (gen_min, gen_max) = (5, 1000)
+        pop_size = int(np.clip(10*self.problem.DP, pop_min, pop_max))
+
+        prob = SurrogateProblem(self.problem, self.computer, data, models, self.options, tids[0], self.models_transfer)
+        X = np.random.RandomState(0).rand(pop_size, len(prob.get_bounds()[0]))
+        t1 = time.time()
+        prob.population_fitness(X)
+        cost = max(time.time() - t1, 1e-6)/pop_size*self.search_budget_overhead # seconds per individual, corrected by the measured time of the previous searches
+
+        if (kwargs['distributed_memory_parallelism']):
+            workers = kwargs['search_multitask_processes']
+        elif (kwargs['shared_memory_parallelism']):
+            workers = kwargs['search_multitask_threads']
+        else:
+            workers = 1
+        workers = max(1, min(workers or 1, len(tids))) # searches running at the same time
+        task_budget = kwargs['search_time_budget']*workers/len(tids)
+        rounds = self.search_rounds(kwargs)
+
+        gen = int(task_budget/(cost*pop_size*rounds))
+        if (gen < gen_min): # the budget is too short for this population, the population shrinks instead
+            pop_size = max(pop_min, int(task_budget/(cost*gen_min*rounds)))
+            gen = gen_min
+        gen = min(gen, gen_max)
+        pop_size = 4*int(np.ceil(pop_size/4)) # e.g. nsga2 requires a multiple of 4
+
+        self.search_budget = {'search_time_budget': kwargs['search_time_budget'], 'DP': self.problem.DP, 'training_points': sum(len(P_) for P_ in data.P), 'tasks': len(tids), 'workers': workers,
+                              'fitness_cost': cost, 'overhead': self.search_budget_overhead, 'search_pop_size': pop_size, 'search_gen': gen, 'rounds': rounds, 'predicted': cost*pop_size*gen*rounds*len(tids)/workers}
+        if (kwargs['verbose']):
+            print("search budget: ", self.search_budget)
+
+        return dict(kwargs, search_pop_size = pop_size, search_gen = gen)
+
+    def make_archipelago(self, prob, algo, token : str, kwargs : dict, seed = None, b = None, pops = None):
+
+        """ pygmo archipelago of search_threads islands of type search_udi evolving prob with algo, the islands being created with random populations of size search_pop_size or with the populations pops.
+        With search_udi='process_island', each island is a SearchProcessIsland evolving in its own process, token identifies the search so that the problem is sent once to each process """
+
+        import pygmo as pg
+
+        if (kwargs["search_udi"] == 'process_island'):
+            udis = [SearchProcessIsland(i, token) for i in range(kwargs['search_threads'] if pops is None else len(pops))]
+        else:
+            try:
+                udi = eval(f'pg.{kwargs["search_udi"]}()')
+            except:
+                raise Exception(f'Unknown user-defined-island "{kwargs["search_udi"]}"')
+            if (pops is None):
+                if seed == None:
+                    return pg.archipelago(n = kwargs['search_threads'], prob = prob, algo = algo, udi = udi, pop_size = kwargs['search_pop_size'], b = b)
+                return pg.archipelago(n = kwargs['search_threads'], prob = prob, algo = algo, udi = udi, pop_size = kwargs['search_pop_size'], b = b, seed = seed)
+            udis = [udi]*len(pops)
+        archi = pg.archipelago()
+        for (i, udi) in enumerate(udis):
+            if (pops is not None):
+                archi.push_back(algo = algo, pop = pops[i], udi = udi)
+            elif seed == None:
+                archi.push_back(algo = algo, prob = prob, udi = udi, size = kwargs['search_pop_size'], b = b)
+            else:
+                archi.push_back(algo = algo, prob = prob, udi = udi, size = kwargs['search_pop_size'], b = b, seed = seed + i)
+        return archi
+
+    @staticmethod
+    def select_diverse(X, n):   # greedy max-min distance selection of n rows of X, starting from the first one
+
+        if (len(X) <= n):
+            return X
+        selected = [0]
+        dist = np.sum((X - X[0])**2, axis=1)
+        for i in range(1, n):
+            j = int(np.argmax(dist))
+            selected.append(j)
+            dist = np.minimum(dist, np.sum((X - X[j])**2, axis=1))
+        return X[selected]
+
+    def keep_warm_population(self, tid : int, pops, kwargs : dict):
+
+        """ Keep, for the next search of task tid, the champion and a diverse subset of the best feasible individuals of each final population pops """
+
+        n_keep = int(kwargs['search_warm_start_fraction']*kwargs['search_pop_size'])
+        if (n_keep < 1):
+            return
+        kept = []
+        for pop in pops:
+            xs = np.array(pop.get_x())
+            fs = np.array(pop.get_f())
+            feasible = np.max(fs, axis=1) < self.options['search_bigval']
+            xs = xs[feasible]
+            if (self.problem.DO == 1):
+                xs = xs[np.argsort(fs[feasible][:,0], kind='stable')]   # champion first
+            # else the individuals of a multi-objective population are already sorted by non-domination rank
+            kept.append(self.select_diverse(xs[:2*n_keep], n_keep))
+        kept = np.vstack(kept)
+        if (len(kept) > 0):
+            self.warm_populations[tid] = kept
+
+    def warm_start_populations(self, prob, tid : int, n_pops : int, pop_size : int, seed, b, kwargs : dict):
+
+        """ Populations of the next search of task tid: the individuals kept by keep_warm_population, evaluated at once on the current surrogate and spread over the n_pops populations, completed with random individuals.
+        Returns None if nothing was kept for task tid """
+
+        import pygmo as pg
+
+        warm = self.warm_populations.get(tid)
+        if (warm is None or warm.shape[1] != len(prob.get_bounds()[0])):   # e.g. search_more_samples changed the dimension of the q-EI/q-UCB problem
+            return None
+        warm = np.clip(warm, *prob.get_bounds()) # the bounds of the search may have changed, see search_bounds_topk
+        n_keep = int(kwargs['search_warm_start_fraction']*pop_size)
+        fs = np.array(prob.batch_fitness(warm.ravel())).reshape(len(warm), -1)   # the surrogate changed since the individuals were kept
+        pops = []
+        for i in range(n_pops):
+            xs = warm[i::n_pops][:n_keep]
+            fs_ = fs[i::n_pops][:n_keep]
+            if (b is not None and seed is not None):
+                pop = pg.population(prob = prob, size = pop_size - len(xs), b = b, seed = seed + i)
+            elif (b is not None):
+                pop = pg.population(prob = prob, size = pop_size - len(xs), b = b)
+            elif (seed is not None):
+                pop = pg.population(prob = prob, size = pop_size - len(xs), seed = seed + i)
+            else:
+                pop = pg.population(prob = prob, size = pop_size - len(xs))
+            for (x, f) in zip(xs, fs_):
+                pop.push_back(x, f)
+            pops.append(pop)
+        return pops
+
+    def search_multitask_process_pool(self, data : Data, models : Collection[Model], tids : Collection[int], kwargs : dict):   # returns None if the search cannot be run in separate processes
+
+        global _search_executor
+
+        snapshots = None
+        if (models is not None):
+            snapshots = [model.snapshot() for model in models]
+            snapshots = [snapshot if snapshot is not None else model for (snapshot, model) in zip(snapshots, models)]
+        kwargs_tmp = {key: kwargs[key] for key in kwargs if key != 'mpi_comm'}   # mpi_comm is not picklable
+        try:
+            if (_search_executor is None or _search_executor[0] != kwargs['search_multitask_threads']):
+                if (_search_executor is not None):
+                    _search_executor[1].shutdown()
+                _search_executor = (kwargs['search_multitask_threads'], concurrent.futures.ProcessPoolExecutor(max_workers = kwargs['search_multitask_threads']))
+            futures_ = [_search_executor[1].submit(search_process, self, data, snapshots, tid, kwargs_tmp) for tid in tids]
+            res = []
+            for (tid, future) in zip(tids, futures_):
+                (res_, state) = future.result()
+                res.append(res_)
+                for (name, value) in zip(self.task_state, state):   # the searcher is a copy in the process, bring back its state for task tid
+                    if (value is not None):
+                        getattr(self, name)[tid] = value
+        except Exception as inst:
+            print(f"Warning: the search could not be run in separate processes ('{inst}'), using threads instead")
+            if (isinstance(inst, concurrent.futures.process.BrokenProcessPool)):
+                _search_executor = None
+            res = None
+        finally:
+            if (snapshots is not None):
+                for (snapshot, model) in zip(snapshots, models):
+                    if (snapshot is not model and isinstance(snapshot, Model_GPy_Snapshot)):   # the models may be snapshots already, e.g. in search_multitask_batch
+                        snapshot.close()
+
+        return res
+
+    def search_multitask_joint(self, data : Data, models : Collection[Model], tids : Collection[int], kwargs : dict):
+
+        """ Runs the searches of all the tasks together, one thread per task, predicting the points of all the tasks with one call of each model (PredictorBatch) instead of one call per task """
+
+        batches = [PredictorBatch(model) for model in models]
+        models_tasks = [Model_PredictorTask(self.problem, batch) for batch in batches]
+        for batch in batches:
+            for tid in tids:   # all the searches are registered before any starts predicting
+                batch.register(tid)
+
+        def fun(tid):
+            try:
+                return self.search(data=data, models=models_tasks, tid=tid, kwargs=kwargs)
+            finally:
+                for batch in batches:
+                    batch.finish(tid)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers = len(tids)) as executor:
+            res = list(executor.map(fun, tids))
+
+        return res
+
+    def search_multitask_batch(self, data : Data, models : Collection[Model], tids : Collection[int] = None, **kwargs) -> Collection[np.ndarray]:
+
+        """ Proposes search_batch_size searches per task, e.g. to fill the objective_evaluation_parallelism evaluation instances, returning the points of the successive searches of each task stacked as in search_multitask.
+        After each search, the proposed points are added to the data and to snapshots of the models with fantasized outputs (search_batch_lie) through Model_GPy_Snapshot.fantasize, without retraining the models, before searching again.
+        With search_af='TS', each search minimizes its own posterior draw of the models instead """
+
+        if (tids is None):
+            tids = list(range(data.NI))
+        if (kwargs.get('search_time_budget') is not None and kwargs['search_batch_size'] > 1): # the budget is shared by the successive searches
+            kwargs = dict(kwargs, search_time_budget = kwargs['search_time_budget']/kwargs['search_batch_size'])
+        if (kwargs['search_af'] == 'TS' and kwargs['search_batch_size'] > 1 and models is not None and data.P is not None): # independent posterior draws, drawn jointly for all the tasks, no fantasized outputs are needed
+            batches = {}
+            data_f = Data(self.problem, I = data.I, P = list(data.P), O = list(data.O), D = data.D)
+            for j in range(kwargs['search_batch_size']):
+                seed = kwargs['search_random_seed']
+                if (seed is not None and data.P is not None):
+                    seed += sum(len(P_) for P_ in data.P) + j*data.NI
+                draws = [model.thompson_sample(kwargs['search_ts_features'], seed) for model in models]
+                if (any(draw is None for draw in draws)):
+                    raise Exception("search_af 'TS' requires models supporting posterior draws (Model_GPy_LCM or Model_LCM with RBF or Matern kernels, without model stacking or mean function)")
+                res = self.search_multitask(data = data_f, models = draws, tids = tids, **kwargs)
+                newdata = Data(self.problem, I = data.I, P = [np.empty((0, self.problem.DP)) for i in range(data.NI)], O = [np.empty((0, self.problem.DO)) for i in range(data.NI)], D = data.D)
+                for res_ in res:
+                    batches.setdefault(res_[0], []).append(np.array(res_[1][0], ndmin=2))
+                    newdata.P[res_[0]] = batches[res_[0]][-1]
+                    newdata.O[res_[0]] = np.hstack([draw.predict(newdata.P[res_[0]], res_[0])[0] for draw in draws])
+                data_f.merge(newdata) # the next searches avoid the points proposed already
+            for res_ in res:
+                res_[1][0] = np.vstack(batches[res_[0]])
+            return res
+
+        res = self.search_multitask(data = data, models = models, tids = tids, **kwargs)
+        if (kwargs['search_batch_size'] <= 1 or models is None or data.P is None):
+            return res
+
+        models_f = [model.snapshot() for model in models]
+        if (any(model is None for model in models_f)):
+            print("Warning: the models do not support fantasized outputs, a single search per task is performed")
+            for model in models_f:
+                if (model is not None):
+                    model.close()
+            return res
+
+        batches = {res_[0]: [np.array(res_[1][0], ndmin=2)] for res_ in res}
+        data_f = Data(self.problem, I = data.I, P = list(data.P), O = list(data.O), D = data.D)
+        try:
+            for j in range(1, kwargs['search_batch_size']):
+                newdata = Data(self.problem, I = data.I, P = [np.empty((0, self.problem.DP)) for i in range(data.NI)], D = data.D)
+                for res_ in res:
+                    newdata.P[res_[0]] = np.array(res_[1][0], ndmin=2)
+                X = np.vstack(newdata.P)
+                tids_f = np.concatenate([[i]*len(newdata.P[i]) for i in range(data.NI)]).astype(int)
+                O_f = []
+                for o in range(self.problem.DO):
+                    if (kwargs['search_batch_lie'] == 'believer'): # kriging believer: posterior mean
+                        lies = np.vstack([models_f[o].predict(newdata.P[i], i)[0] for i in range(data.NI) if len(newdata.P[i]) > 0])
+                    else: # constant liar: minimum, maximum or mean of the outputs of the task
+                        lie = {'min': np.min, 'max': np.max, 'mean': np.mean}[kwargs['search_batch_lie']]
+                        lies = np.array([lie(data.O[tid][:,o]) for tid in tids_f]).reshape(-1, 1)
+                    models_f[o].fantasize(X, lies, tids_f)
+                    O_f.append(lies)
+                O_f = np.hstack(O_f)
+                newdata.O = [O_f[tids_f == i] for i in range(data.NI)]
+                data_f.merge(newdata)
+
+                res = self.search_multitask(data = data_f, models = models_f, tids = tids, **kwargs)
+                for res_ in res:
+                    batches[res_[0]].append(np.array(res_[1][0], ndmin=2))
+        finally:
+            for model in models_f:
+                model.close()
+
+        for res_ in res:
+            res_[1][0] = np.vstack(batches[res_[0]])
+        return res
+
+_search_executor = None # (number of processes, persistent pool of processes) used by Search.search_multitask_process_pool, kept across the MLA iterations until shutdown_executors
+
+def shutdown_executors():   # registered with atexit, can also be called by the driver once it is done with the searches
+
+    global _search_executor
+
+    if (_search_executor is not None):
+        _search_executor[1].shutdown()
+        _search_executor = None
+    for executor in _island_executors:
+        executor.shutdown()
+    _island_executors.clear()
+
+atexit.register(shutdown_executors)
+
+def search_process(searcher, data, models, tid, kwargs):   # runs in a process of _search_executor
+
+    try:
+        res = searcher.search(data=data, models = models, tid = tid, kwargs = kwargs)
+        return (res, [getattr(searcher, name).get(tid) for name in searcher.task_state])
+    finally:
+        if (models is not None):
+            for model in models:
+                if (isinstance(model, Model_GPy_Snapshot)):
+                    model.close()   # detach from the shared memory blocks
+
+_island_executors = [] # persistent pools of one process each, used by the islands of index 0, 1, ... of SearchProcessIsland, kept across the searches until shutdown_executors
+_island_problems = {} # in a process of _island_executors: search token -> pygmo problem of the search
+
+def island_evolve(token, udp, algo, X, F):   # runs in a process of _island_executors, returns None if the problem of the search is not there
+
+    import pygmo as pg
+
+    if (udp is not None):
+        _island_problems.clear()
+        _island_problems[token] = pg.problem(udp)
+    if (token not in _island_problems):
+        return None
+    pop = pg.population(_island_problems[token])
+    for (x, f) in zip(X, F):
+        pop.push_back(x, f)
+    pop = algo.evolve(pop)
+    return (algo, pop.get_x(), pop.get_f())
+
+class SearchProcessIsland(object):
+
+    """ pygmo user-defined island (search_udi='process_island') evolving its population in a persistent process, one per island index, so that the islands of an archipelago can evolve the Python surrogate problem, which pygmo's thread_island rejects as it does not provide the 'basic' thread safety guarantee.
+    The surrogate problem (data and models) of a search, identified by token, is sent to the process with the first evolve of the island only, the next evolves (after each migration) send the algorithm and the decision vectors and fitnesses of the population.
+    The processes are spawned, the driver script must then guard its main code with if __name__ == "__main__" """
+
+    def __init__(self, index : int, token : str):
+
+        self.index = index
+        self.token = token
+        self.sent = False
+
+    def run_evolve(self, algo, pop):
+
+        import multiprocessing
+
+        while (len(_island_executors) <= self.index):
+            _island_executors.append(concurrent.futures.ProcessPoolExecutor(max_workers = 1, mp_context = multiprocessing.get_context('spawn')))
+        try:
+            ret = None
+            if (self.sent):
+                ret = _island_executors[self.index].submit(island_evolve, self.token, None, algo, pop.get_x(), pop.get_f()).result()
+            if (ret is None):   # first evolve, or the process lost the problem (e.g. another search ran in between)
+                ret = _island_executors[self.index].submit(island_evolve, self.token, pop.problem.extract(object), algo, pop.get_x(), pop.get_f()).result()
+                self.sent = True
+        except Exception as inst:
+            print(f"Warning: the island could not evolve in a separate process ('{inst}'), evolving in this process instead")
+            if (isinstance(inst, concurrent.futures.process.BrokenProcessPool)):
+                _island_executors[self.index] = concurrent.futures.ProcessPoolExecutor(max_workers = 1, mp_context = multiprocessing.get_context('spawn'))
+            return (algo, algo.evolve(pop))
+        (algo, X, F) = ret
+        for i in range(len(X)):
+            pop.set_xf(i, X[i], F[i])
+        return (algo, pop)
+
+    def get_name(self):
+
+        return "GPTune process island"
+
+class SearchStall(object):
+
+    """ Stall detector of an iterative search: the search is stalled once its best fitness has not improved by more than the relative tolerance tol for the last rounds consecutive rounds """
+
+    def __init__(self, tol : float, rounds : int):
+
+        self.tol = tol
+        self.rounds = rounds
+        self.best = None
+        self.count = 0 # number of consecutive rounds without improvement
+
+    def update(self, f : float) -> bool:
+
+        if (self.best is None or f < self.best - self.tol*abs(self.best)):
+            self.count = 0
+        else:
+            self.count += 1
+        if (self.best is None or f < self.best):
+            self.best = f
+        return self.stalled()
+
+    def stalled(self) -> bool:
+
+        return self.count >= self.rounds
+
+def search_bounds(problem : Problem, data : Data, tid : int, options : Options):
+
+    """ Bounds (lower, upper) of the search of task tid in the normalized parameter space: the whole space, or with search_bounds_topk the bounding box of the search_bounds_topk best samples of the task widened by search_bounds_margin.
+    For multi-objective problems, the best samples are the samples of the Pareto front with the smallest sum of ranks over the objectives. The whole space is kept for the tasks with less than search_bounds_min_samples samples and every search_bounds_sweep-th sample """
+
+    lower = np.zeros(problem.DP)
+    upper = np.ones(problem.DP)
+    topk = options['search_bounds_topk']
+    if (topk is None or data.O is None or data.P is None or tid >= len(data.O) or data.O[tid] is None):
+        return (lower, upper)
+    O = np.array(data.O[tid], dtype=float).reshape(-1, problem.DO)
+    n = len(O)
+    sweep = options['search_bounds_sweep']
+    if (n < max(options['search_bounds_min_samples'], topk, 1) or (sweep is not None and sweep > 0 and n % sweep == 0)):
+        return (lower, upper)
+    if (problem.DO == 1):
+        best = np.argsort(O[:,0], kind='stable')[:topk]
+        best = best[np.isfinite(O[best,0])]
+    else:
+        (best, F) = data.pareto_front(tid)
+        if (len(best) > topk):
+            ranks = np.sum(np.argsort(np.argsort(F, axis=0, kind='stable'), axis=0), axis=1)
+            best = best[np.argsort(ranks, kind='stable')[:topk]]
+    if (len(best) == 0):
+        return (lower, upper)
+    X = np.array(data.P[tid], dtype=float)[best]
+    margin = options['search_bounds_margin']
+    return (np.clip(np.min(X, axis=0) - margin, 0., 1.), np.clip(np.max(X, axis=0) + margin, 0., 1.))
+
 class SurrogateProblem(object):
 
-    def __init__(self, problem, computer, data, models, options, tid, models_transfer):   # data is in the normalized space, IOrig and POrig are then generated in the original space
+    def __init__(self, problem, computer, data, models, options, tid, models_transfer):   # data is in the normalized space, IOrig is then generated in the original space
 
         self.problem = problem
         self.computer = computer
@@ -143,12 +573,18 @@ class SurrogateProblem(object):
         # if (self.options['verbose']):
         #     print ("self.IOrig: ", self.IOrig)
 
-        if self.data.P is not None and len(self.data.P[tid]) > 0:
-            self.POrig = self.problem.PS.inverse_transform(np.array(self.data.P[tid], ndmin=2))
-        else:
-            self.POrig = [] # self.POrig = [[]]
-        # if (self.options['verbose']):
-        #     print ("self.POrig: ", self.POrig)
+        self.data.config_index(tid) # hashed set of the evaluated configurations in the original space, used to discard duplicates
+        self.bounds = search_bounds(self.problem, self.data, tid, self.options) # bounds of the search in the normalized parameter space, see search_bounds_topk
+        self.mspe_cache = {} # objective -> terms of the MSPE acquisition function that do not depend on the candidate point, see mspe_batch
+
+        if (self.options['search_af'] == 'TS' and self.models is not None): # the acquisition function is a posterior draw of each model, unless the search received draws (Search.search_multitask_batch)
+            seed = self.options['search_random_seed']
+            if (seed is not None and self.data.P is not None):
+                seed += sum(len(P_) for P_ in self.data.P) + tid
+            self.models = [model if isinstance(model, Model_ThompsonSample) else model.thompson_sample(self.options['search_ts_features'], seed) for model in self.models]
+            if (any(model is None for model in self.models)):
+                raise Exception("search_af 'TS' requires models supporting posterior draws (Model_GPy_LCM or Model_LCM with RBF or Matern kernels, without model stacking or mean function)")
+            self.models_last = self.models
 
         self.models_transfer = models_transfer
         if (self.models != None and self.models_transfer != None and self.options['TLA_method'] == 'Regression'):
@@ -164,28 +600,29 @@ class SurrogateProblem(object):
         #### precompute the adjusted bounds and Pereto Front given all the existing samples
         if self.options['search_af'] == 'UCB-HVI': # YC: the following computation is needed only for UCB-HVI.
         # YC: Note: Using UCB-HVI in TLA_I can cause an error, because TLA_I can fall into this with 0 samples for the target task, so it can't compute the upper bound below.
-            dataO = copy.deepcopy(self.data.O)
+            # the clipping below is monotone in each objective, so the front of the adjusted samples is the front of the adjusted Pareto archive of the raw samples
+            PF = self.data.pareto_front(self.tid)[1]
             A = []
             B = []
             for o in range(self.problem.DO):
                 lower_bound, upper_bound = self.problem.OS.bounds[o]
                 if(math.isinf(upper_bound)):
-                    upper_bound=dataO[self.tid][:,o].max()
+                    upper_bound=self.data.O[self.tid][:,o].max()
                 else:
-                    dataO[self.tid][:,o] = np.where(dataO[self.tid][:,o] < upper_bound, dataO[self.tid][:,o], upper_bound)
+                    PF[:,o] = np.where(PF[:,o] < upper_bound, PF[:,o], upper_bound)
 
                 if(self.problem.OS[o].optimize== False): # if not optimized, set the data on that dimension to be constant
-                    dataO[self.tid][:,o]=upper_bound
+                    PF[:,o]=upper_bound
 
                 A.append(lower_bound)
                 B.append(upper_bound)
 
             self.A=np.array(A).reshape(self.problem.DO,)
             self.B=np.array(B).reshape(self.problem.DO,)
-            from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
-            PF_idx = NonDominatedSorting(method="fast_non_dominated_sort").do(dataO[self.tid], only_non_dominated_front=True)
-            PF = [dataO[self.tid][i,:] for i in PF_idx]
-            self.PF=np.array(PF).reshape(len(PF_idx),self.problem.DO)
+            self.PF=ParetoArchive(self.problem.DO, PF).F
+            (self.HV_lower, self.HV_upper) = (None, None)
+            if ((len(self.PF)+1)**(self.problem.DO-1)*len(self.PF) <= self.options['search_hvi_max_cells']): # size of the grid of hv_box_decomposition, otherwise hvi_batch computes the hypervolumes point by point
+                (self.HV_lower, self.HV_upper) = self.hv_box_decomposition(self.PF, self.B)
 
     def compute_weights(self):
         #This function computes the weights for surrogate models to be combined.
@@ -207,63 +644,27 @@ class SurrogateProblem(object):
 
             ymin = self.data.O[self.tid][:,o].min()
             ymin_index = self.data.O[self.tid][:,o].tolist().index(ymin)
-            x_list = self.data.P[self.tid][:]
-            x_star = x_list[ymin_index]
+            x_list = np.array(self.data.P[self.tid], ndmin=2)
             y_list = self.data.O[self.tid][:,o]
             if self.options['TLA_method'] == 'Regression_No_Scale':
                 LHS = [(-1.0*float(y_elem))-(-1.0*(ymin)) for y_elem in y_list]
             else:
                 LHS = [(-1.0*float(y_elem/ymin))-(-1.0*(ymin/ymin)) for y_elem in y_list]
             print ("LHS: ", LHS)
+
+            # the predictions of all the samples at once, the predictions of the transfer models at the samples are memoized across the iterations
+            (mu, var) = self.models[o].predict_last(x_list, tid=self.tid)
+            mus = [np.asarray(mu, dtype=float).reshape(-1)]
+            for ret in self.transfer_predict(x_list, memoize=True):
+                mus.append(ret[self.problem.OS[o].name][:,0])
             RHS = []
-            for x_sample in x_list:
-                point = self.D
-                point.update({self.problem.IS[k].name: self.IOrig[k] for k in range(self.problem.DI)})
-                point_x_sample = point.copy()
-                point_x_star = point.copy()
-                for k in range(self.problem.DP):
-                    point_x_sample[self.problem.PS[k].name] = x_sample[k]
-                for k in range(self.problem.DP):
-                    point_x_star[self.problem.PS[k].name] = x_star[k]
-
-                x_sample_orig = self.problem.PS.inverse_transform(np.array(x_sample, ndmin=2))[0]
-                x_star_orig = self.problem.PS.inverse_transform(np.array(x_star, ndmin=2))[0]
-                point_x_sample_orig = point.copy()
-                point_x_star_orig = point.copy()
-                for k in range(self.problem.DP):
-                    point_x_sample_orig[self.problem.PS[k].name] = x_sample_orig[k]
-                for k in range(self.problem.DP):
-                    point_x_star_orig[self.problem.PS[k].name] = x_star_orig[k]
-
-                print ("point_x_sample: ", point_x_sample)
-                print ("point_x_star: ", point_x_star)
-                print ("point_x_sample_orig: ", point_x_sample_orig)
-                print ("point_x_star_orig: ", point_x_star_orig)
-
-                RHS_row = []
-                (mu, var) = self.models[o].predict_last(x_sample, tid=self.tid)
-                mu = mu[0][0]
-                (mu_star, var_star) = self.models[o].predict_last(x_star, tid=self.tid)
-                mu_star = mu_star[0][0]
+            for (k, mu) in enumerate(mus):
+                mu_star = mu[ymin_index] if k == 0 else max(1e-18, mu[ymin_index])
                 if self.options['TLA_method'] == 'Regression_No_Scale':
-                    RHS_elem = (-1.0*float(mu))-(-1.0*(mu_star))
+                    RHS.append((-1.0*mu)-(-1.0*(mu_star)))
                 else:
-                    RHS_elem = (-1.0*float(mu/mu_star))-(-1.0*(mu_star/mu_star))
-                print ("RHS_elem (current task): ", RHS_elem)
-                RHS_row.append(RHS_elem)
-                for model_transfer in self.models_transfer:
-                    ret = model_transfer(point_x_sample_orig)
-                    print ("RET: ", ret)
-                    mu = ret[self.problem.OS[o].name][0][0]
-                    ret = model_transfer(point_x_star_orig)
-                    mu_star = max(1e-18, ret[self.problem.OS[o].name][0][0])
-                    if self.options['TLA_method'] == 'Regression_No_Scale':
-                        RHS_elem = (-1.0*float(mu))-(-1.0*(mu_star))
-                    else:
-                        RHS_elem = (-1.0*float(mu/mu_star))-(-1.0*(mu_star/mu_star))
-                    #print ("RHS_elem: ", RHS_elem)
-                    RHS_row.append(RHS_elem)
-                RHS.append(RHS_row)
+                    RHS.append((-1.0*(mu/mu_star))-(-1.0*(mu_star/mu_star)))
+            RHS = np.array(RHS).T
             print ("RHS: ", RHS)
 
             LHS = np.array(LHS)
@@ -282,6 +683,36 @@ class SurrogateProblem(object):
             print ("models_weights_normalized: ", models_weights_normalized)
             return models_weights_normalized
 
+    # Predictions of the transfer models at the rows of X (in the normalized space), one dict per model as returned by GPTune.PredictSurrogateModelBatch: a (n,1) array of means per output name and a (n,1) array of variances per output name + "_var" (NaN if not available).
+    # The model functions without batched interface (model_function.batch) are called point by point. With memoize, the batched model functions keep the predictions for the next calls
+    def transfer_predict(self, X, memoize=False):
+        xi0 = self.problem.PS.inverse_transform(np.array(X, ndmin=2)[:,:self.problem.DP])
+        task = {self.problem.IS[k].name: self.IOrig[k] for k in range(self.problem.DI)}
+        rets = []
+        for model_transfer in self.models_transfer:
+            if hasattr(model_transfer, 'batch'):
+                rets.append(model_transfer.batch(task, xi0, memoize))
+                continue
+            points = []
+            for xi in xi0:
+                point  = {self.problem.PS[k].name: xi[k] for k in range(self.problem.DP)}
+                point.update(self.D)
+                point.update(task)
+                points.append(model_transfer(point))
+            ret = {}
+            for o in range(self.problem.DO):
+                name = self.problem.OS[o].name
+                ret[name] = np.array([point[name][0][0] for point in points], dtype=float).reshape(-1, 1)
+                var = []
+                for point in points:
+                    try:
+                        var.append(float(point[name+"_var"][0][0]))
+                    except:
+                        var.append(np.nan)
+                ret[name+"_var"] = np.array(var).reshape(-1, 1)
+            rets.append(ret)
+        return rets
+
     def get_nobj(self):
         if(self.options['search_algo']=='pso' or self.options['search_algo']=='cmaes'):
             return 1
@@ -290,10 +721,67 @@ class SurrogateProblem(object):
 
     def get_bounds(self):
         if(self.options['search_af']=='q-UCB' or self.options['search_af']=='q-EI'): # To the fitness function, input dimension is DP*search_more_samples instead of DP to use the evolutionary algorithm
-            DP = self.problem.DP*self.options['search_more_samples']
+            q = self.options['search_more_samples']
         else:
-            DP = self.problem.DP
-        return ([0. for i in range(DP)], [1. for  i in range(DP)])
+            q = 1
+        return (np.tile(self.bounds[0], q).tolist(), np.tile(self.bounds[1], q).tolist())
+
+    # Decompose the region of [-inf, B] not dominated by the Pareto front PF into disjoint boxes [lower, upper] (one row per box).
+    # The grid of the first DO-1 objectives is given by the coordinates of PF, in each cell the non-dominated part of the last objective is an interval ending at the smallest last coordinate of the points dominating the cell
+    def hv_box_decomposition(self, PF, B):
+        DO = len(B)
+        PF = np.minimum(np.array(PF, ndmin=2), B)
+        if (DO == 1):
+            return (np.array([[-np.inf]]), np.array([[np.min(PF)]]))
+        breaks = [np.concatenate(([-np.inf], np.unique(PF[:,j]), [B[j]])) for j in range(DO-1)]
+        breaks = [np.unique(b[b <= B[j]]) for (j, b) in enumerate(breaks)]
+        lower = np.array(np.meshgrid(*[b[:-1] for b in breaks], indexing='ij')).reshape(DO-1, -1).T
+        dominating = np.all(PF[np.newaxis,:,:-1] <= lower[:,np.newaxis,:], axis=2) # cells x points
+        top = np.min(np.where(dominating, PF[np.newaxis,:,-1], B[-1]), axis=1)
+        # merge the consecutive cells along the first objective that have the same interval in the last objective
+        top = np.moveaxis(top.reshape([len(b)-1 for b in breaks]), 0, -1).reshape(-1, len(breaks[0])-1)
+        others = [np.zeros((1, 0)), np.zeros((1, 0))] # lower and upper bounds of the cells in the other objectives
+        if (DO > 2):
+            others = [np.meshgrid(*[b[:-1] for b in breaks[1:]], indexing='ij'), np.meshgrid(*[b[1:] for b in breaks[1:]], indexing='ij')]
+            others = [np.array(o).reshape(DO-2, -1).T for o in others]
+        lower = []
+        upper = []
+        for r in range(top.shape[0]):
+            starts = np.flatnonzero(np.concatenate(([True], top[r,1:] != top[r,:-1])))
+            ends = np.concatenate((starts[1:], [top.shape[1]]))
+            for (i, j) in zip(starts, ends):
+                lower.append(np.concatenate(([breaks[0][i]], others[0][r], [-np.inf])))
+                upper.append(np.concatenate(([breaks[0][j]], others[1][r], [top[r,i]])))
+        return (np.array(lower), np.array(upper))
+
+    # Exclusive hypervolume contributions of the rows of Y with respect to the Pareto front, computed on the box decomposition of the non-dominated region
+    def hvi_batch(self, Y):
+        Y = np.array(Y, ndmin=2)
+        hvi = np.zeros(Y.shape[0])
+        if self.HV_lower is None: # the front is too large for the box decomposition, see search_hvi_max_cells
+            for k in range(Y.shape[0]):
+                hvi[k] = self.hvi_exclusive(Y[k])
+            return hvi
+        for k in range(0, Y.shape[0], 256):
+            widths = self.HV_upper[np.newaxis,:,:] - np.maximum(Y[k:k+256,np.newaxis,:], self.HV_lower[np.newaxis,:,:])
+            hvi[k:k+256] = np.sum(np.prod(np.maximum(widths, 0), axis=2), axis=1)
+        return hvi
+
+    # Exclusive hypervolume contribution of the point y with respect to the Pareto front
+    def hvi_exclusive(self, y):
+        if self.is_dominated(y, self.PF) or np.any(y > self.B):
+            return 0
+        #add y to the list of points
+        points = np.vstack((self.PF,np.atleast_2d(y)))
+        if importlib.util.find_spec("pygmo") is not None:
+            import pygmo as pg
+            hv = pg.hypervolume(points)
+            #calculate the exclusive contribution to the hypervolume from our point
+            return hv.exclusive(len(points)-1, self.B)
+        else:
+            from pymoo.indicators.hv import HV
+            ind = HV(ref_point=np.array(self.B))
+            return ind(points) - ind(self.PF)
 
     def is_dominated(self, x, S):
         is_dom = False
@@ -312,28 +800,12 @@ class SurrogateProblem(object):
                 # print(o,self.models[o].M.kern.lengthscale)
                 (mu, var) = self.models[o].predict(x, tid=self.tid)
                 var = max(1e-18, var[0][0])
-                uhvi_pt[o] = (mu - np.sqrt(self.options['search_ucb_beta']* var))
+                uhvi_pt[o] = (mu[0][0] - np.sqrt(self.options['search_ucb_beta']* var))
             uhvi_pt = np.where(uhvi_pt > self.A, uhvi_pt, self.A)
             for o in range(self.problem.DO):
                 if(self.problem.OS[o].optimize== False): # if not optimized, set the data on that dimension to be constant
                     uhvi_pt[o]=self.B[o]
-            if self.is_dominated(uhvi_pt, self.PF) or np.any(uhvi_pt > self.B):
-                uhvi = 0
-            else:
-                #add the uhvi_pt to the list of points
-                points = np.vstack((self.PF,np.atleast_2d(uhvi_pt)))
-                if importlib.util.find_spec("pygmo") is not None:
-                    import pygmo as pg
-                    hv = pg.hypervolume(points)
-                    #calculate the exclusive contribution to the hypervolume from our point
-                    uhvi = hv.exclusive(len(points)-1, self.B)
-                else:
-                    from pymoo.indicators.hv import HV
-                    ref_point = np.array(self.B)
-                    ind = HV(ref_point=ref_point)
-                    uhvi = ind(points) - ind(self.PF)
-                    # print(uhvi,ind(points),ind(self.PF),uhvi_pt,self.B,self.A)
-
+            uhvi = self.hvi_batch(uhvi_pt)[0]
             
             return [-uhvi]
         else:
@@ -366,6 +838,9 @@ class SurrogateProblem(object):
                                 Phi = 0.5 * (1.0 + sp.special.erf(chi / np.sqrt(2)))
                                 phi = np.exp(-0.5 * chi**2) / np.sqrt(2 * np.pi * var)
                                 AF.append(-((ymin - mu -self.options['search_ei_alpha']) * Phi + std * phi))
+                            elif self.options['search_af'] == 'TS': # the models are posterior draws
+                                (mu, var) = self.models[o].predict(x, tid=self.tid)
+                                AF.append(mu[0][0])
                             elif self.options['search_af'] == 'UCB': # as we are minimizing af, use mu - sqrt(beta)std (LCB) instead of mu + sqrt(beta)std (UCB)
                                 (mu, var) = self.models[o].predict(x, tid=self.tid)
                                 mu = mu[0][0]
@@ -373,87 +848,10 @@ class SurrogateProblem(object):
                                 std = np.sqrt(var)                            
                                 AF.append(mu - np.sqrt(self.options['search_ucb_beta'])*std)
                             elif self.options['search_af'] == 'MSPE': #min square prediction error as used in cGP                          
-                                X_joint = np.vstack((x,np.array(self.data.P[self.tid], ndmin=2)))
-                                (mu_cross, sigma_cross) = self.models[o].predict(X_joint, tid=self.tid, full_cov=True)
-                                sigma = sigma_cross[0:1,0:1]
-                                sigma_obs = sigma_cross[1:sigma_cross.shape[1],1:sigma_cross.shape[1]]
-                                sigma_cross = sigma_cross[0:1,1:sigma_cross.shape[1]]
-                                sigma_cross = sigma_cross.reshape(-1,1).T                            
-                                mspe = (sigma - sigma_cross @ sigma_obs @ sigma_cross.T)/(X_joint.shape[0]-1)
-                                AF.append(mspe[0][0])
-                            elif self.options['search_af'] == 'q-UCB': #multi-point UCB function in the paper "The reparameterization trick for acquisition functions", 2017
+                                AF.append(self.mspe_batch(o, np.array(x, ndmin=2))[0])
+                            elif self.options['search_af'] == 'q-UCB' or self.options['search_af'] == 'q-EI': #multi-point UCB and EI functions in the paper "The reparameterization trick for acquisition functions", 2017
                                 (mu_cross, sigma_cross) = self.models[o].predict(x, tid=self.tid, full_cov=True)
-                                # print(mu_cross,sigma_cross,x.shape[0])
-                                
-                                if(x.shape[0]==1):
-                                    tmp = mu_cross-np.sqrt(sigma_cross*self.options['search_ucb_beta'] * np.pi/2)
-                                    tmp = tmp[0][0]
-                                else:
-                                    n=1000*self.options['search_more_samples'] # number of Monte Carlo samples, this is from heuristics
-                                    tmp=0
-                                    sigma_cross0 = sigma_cross *self.options['search_ucb_beta'] * np.pi/2                                    
-                                    
-                                    jitter=self.options['model_jitter']
-                                    flag=0
-                                    for i in range(self.options['model_max_jitter_try']):
-                                        try:
-                                            sigma_cross = np.linalg.cholesky(sigma_cross0+np.diag(np.ones((1,self.options['search_more_samples']))*jitter))
-                                            flag=1
-                                            break
-                                        except:
-                                            jitter=jitter*10
-                                    if(flag==0):
-                                        raise Exception("sigma_cross not SPD after jittering")
-
-                                    if(True):
-                                        zk0 = np.random.randn(x.shape[0],n)
-                                        mat=- np.absolute(sigma_cross @ zk0)
-                                        mat+=mu_cross
-                                        tmp = np.amax(mat,axis = 0)
-                                        tmp =np.sum(tmp)
-                                    else:
-                                        for i in range(n):
-                                            zk = np.random.randn(x.shape[0])
-                                            uaL = np.amax(mu_cross - np.absolute(sigma_cross @ zk))/n
-                                            tmp = tmp + uaL
-                                            # print(i,uaL,np.absolute(sigma_cross @ zk))
-                                # print(tmp)
-                                # sys.exit()
-                                AF.append(tmp)
-                            elif self.options['search_af'] == 'q-EI': #multi-point EI function in the paper "The reparameterization trick for acquisition functions", 2017
-                                ymin = self.data.O[self.tid][:,o].min()
-                                (mu_cross, sigma_cross0) = self.models[o].predict(x, tid=self.tid, full_cov=True)
-                                
-                                n=1000*self.options['search_more_samples'] # number of Monte Carlo samples, this is heuristics
-                                tmp=0
-
-                                jitter=self.options['model_jitter']
-                                flag=0
-                                for i in range(self.options['model_max_jitter_try']):
-                                    try:
-                                        sigma_cross = np.linalg.cholesky(sigma_cross0+np.diag(np.ones((1,self.options['search_more_samples']))*jitter))
-                                        flag=1
-                                        break
-                                    except:
-                                        jitter=jitter*10
-                                if(flag==0):
-                                    raise Exception("sigma_cross not SPD after jittering")
-                                
-                                if(True):
-                                    zk0 = np.random.randn(x.shape[0],n)
-                                    mat = sigma_cross @ zk0
-                                    tmpcol = ymin - mu_cross -self.options['search_ei_alpha']
-                                    mat += tmpcol
-                                    tmp = np.amax(mat,axis = 0)
-                                    tmp =np.sum(x for x in tmp if x>0)
-                                else:
-                                    for i in range(n):
-                                        zk = np.random.randn(x.shape[0])
-                                        uaL = max(0.0,np.amax(ymin - mu_cross -self.options['search_ei_alpha'] + sigma_cross @ zk )/n)
-                                        tmp = tmp + uaL
-                                        # print(i,uaL,np.absolute(sigma_cross @ zk))
-
-                                AF.append(-tmp)
+                                AF.append(self.q_af(o, np.array(mu_cross).reshape(1, -1), np.array(sigma_cross).reshape(1, x.shape[0], x.shape[0]))[0])
                             else:
                                 raise Exception("unknown aquicision function %s"%(self.options['search_af']))
                             # AF.append(mu)
@@ -461,7 +859,7 @@ class SurrogateProblem(object):
                         xi0 = self.problem.PS.inverse_transform(np.array(x, ndmin=2))
                         xi=xi0[0]
 
-                        if (any(xx==xi for xx in self.POrig)):
+                        if (self.data.has_config(self.tid, xi)):
                             cond = False
                         else:
                             point0 = self.D
@@ -489,7 +887,7 @@ class SurrogateProblem(object):
                         xi0 = self.problem.PS.inverse_transform(np.array(x, ndmin=2))
                         xi=xi0[0]
 
-                        if (any(xx==xi for xx in self.POrig)):
+                        if (self.data.has_config(self.tid, xi)):
                             cond = False
                         else:
                             point0 = self.D
@@ -537,7 +935,7 @@ class SurrogateProblem(object):
                         xi0 = self.problem.PS.inverse_transform(np.array(x, ndmin=2))
                         xi=xi0[0]
 
-                        if (any(xx==xi for xx in self.POrig)):
+                        if (self.data.has_config(self.tid, xi)):
                             cond = False
                         else:
                             point0 = self.D
@@ -578,6 +976,223 @@ class SurrogateProblem(object):
             # else:
             #     return AF
 
+    def predict_batch(self, o, X):   # returns the 1D arrays mu and var of objective o at the rows of X
+        if len(getattr(self.models[o], 'M_stacked', [])) > 0: # the stacked models can only predict one point at a time
+            mu = np.empty(X.shape[0])
+            var = np.empty(X.shape[0])
+            for i in range(X.shape[0]):
+                (mu_, var_) = self.models[o].predict(X[i:i+1,:], tid=self.tid)
+                mu[i] = np.asarray(mu_).ravel()[0]
+                var[i] = np.asarray(var_).ravel()[0]
+        else:
+            (mu, var) = self.models[o].predict(X, tid=self.tid)
+            mu = np.asarray(mu, dtype=float).reshape(-1)
+            var = np.asarray(var, dtype=float).reshape(-1)
+        return (mu, np.maximum(1e-18, var))
+
+    # Min square prediction error of objective o (as in cGP) at the rows of X: (sigma - sigma_cross sigma_obs sigma_cross^T)/n, with sigma the posterior variance at a row,
+    # sigma_cross its posterior covariance with the n samples of the task and sigma_obs the posterior covariance of the samples. sigma_obs does not depend on the row and is computed once per search,
+    # a Model_Predictor also keeps the terms of sigma_cross depending only on the samples (Model_Predictor.cross_cov), other models predict the joint covariance of a chunk of rows and the samples
+    def mspe_batch(self, o, X):
+        P = np.array(self.data.P[self.tid], ndmin=2)
+        cache = self.mspe_cache.setdefault(o, {})
+        if ('sigma_obs' not in cache):
+            cache['sigma_obs'] = np.array(self.models[o].predict(P, tid=self.tid, full_cov=True)[1], ndmin=2)
+        model = self.models[o].batch.predictor if isinstance(self.models[o], Model_PredictorTask) else self.models[o]
+        if isinstance(model, Model_Predictor):
+            (sigma, sigma_cross) = model.cross_cov(X, P, self.tid, cache)
+        else:
+            sigma = np.empty((X.shape[0], 1))
+            sigma_cross = np.empty((X.shape[0], P.shape[0]))
+            for k in range(0, X.shape[0], 64):
+                m = min(64, X.shape[0] - k)
+                sigma_joint = np.array(self.models[o].predict(np.vstack((X[k:k+m,:], P)), tid=self.tid, full_cov=True)[1], ndmin=2)
+                sigma[k:k+m,0] = np.diag(sigma_joint)[0:m]
+                sigma_cross[k:k+m,:] = sigma_joint[0:m,m:]
+        return (sigma[:,0] - np.sum(np.dot(sigma_cross, cache['sigma_obs'])*sigma_cross, axis=1))/P.shape[0]
+
+    # Acquisition function evaluated for all rows of X at once, returns an array of size X.shape[0] x len(self.af(x))
+    def af_batch(self, X):
+
+        X = np.array(X, ndmin=2)
+        if self.options['search_af'] == 'UCB-HVI':
+            uhvi_pt = np.empty((X.shape[0], self.problem.DO))
+            for o in range(self.problem.DO):
+                (mu, var) = self.predict_batch(o, X)
+                uhvi_pt[:,o] = mu - np.sqrt(self.options['search_ucb_beta']* var)
+            uhvi_pt = np.where(uhvi_pt > self.A, uhvi_pt, self.A)
+            for o in range(self.problem.DO):
+                if(self.problem.OS[o].optimize== False): # if not optimized, set the data on that dimension to be constant
+                    uhvi_pt[:,o]=self.B[o]
+            return -self.hvi_batch(uhvi_pt).reshape(-1, 1)
+
+        vectorized = self.options['search_af'] == 'EI' or self.options['search_af'] == 'UCB' or self.options['search_af'] == 'MSPE'
+        transfer = self.models_transfer != None and (self.models is None or self.options['TLA_method'] == 'Regression' or self.options['TLA_method'] == 'Sum') # the transfer models are combined with the models
+        if self.models_transfer == None:
+            vectorized = vectorized or self.data.O == None or self.options['search_af'] == 'TS'
+        else:
+            vectorized = transfer or (self.models is not None and (self.options['TLA_method'] == 'LCM' or self.options['TLA_method'] == 'LCM_BF'))
+        if (not vectorized):
+            return np.array([self.af(X[i:i+1,:]) for i in range(X.shape[0])], ndmin=2)
+
+        rets = self.transfer_predict(X) if transfer else None
+        AF=[]
+        for o in range(self.problem.DO):
+            optimize = self.problem.OS[o].optimize
+            if (self.options['search_algo']=='pso' and optimize == False):
+                continue
+            elif (optimize == False):
+                AF.append(np.zeros(X.shape[0]))
+                continue
+            if transfer and self.models is None:
+                AF.append(1.0/np.mean([ret[self.problem.OS[o].name][:,0] for ret in rets], axis=0))
+                continue
+            if self.models_transfer == None and self.data.O != None and self.options['search_af'] == 'MSPE':
+                AF.append(self.mspe_batch(o, X))
+                continue
+            (mu, var) = self.predict_batch(o, X)
+            if transfer: # Regression: weighted sum of the means and weighted geometric mean of the variances, Sum: sum of the means and geometric mean of the variances
+                num_models_transfer = len(self.models_transfer)
+                if self.options['TLA_method'] == 'Regression':
+                    (weights, weights_var) = (self.models_weights, self.models_weights)
+                else:
+                    (weights, weights_var) = ([1.0]*(num_models_transfer+1), [1.0/(num_models_transfer+1)]*(num_models_transfer+1))
+                mu = weights[0]*mu
+                var = var**weights_var[0]
+                for (i, ret) in enumerate(rets):
+                    mu = mu + weights[i+1]*ret[self.problem.OS[o].name][:,0]
+                    var_transfer = ret[self.problem.OS[o].name+"_var"][:,0]
+                    var = var*np.where(np.isnan(var_transfer), 1., np.maximum(1e-18, np.nan_to_num(var_transfer))**weights_var[i+1])
+                var = np.maximum(1e-18, var)
+            if self.models_transfer == None and self.data.O == None:
+                AF.append(1.0/mu)
+            elif self.models_transfer == None and self.options['search_af'] == 'UCB':
+                AF.append(mu - np.sqrt(self.options['search_ucb_beta'])*np.sqrt(var))
+            elif self.models_transfer == None and self.options['search_af'] == 'TS':
+                AF.append(mu)
+            else:
+                ymin = self.data.O[self.tid][:,o].min()
+                std = np.sqrt(var)
+                chi = (ymin - mu -self.options['search_ei_alpha']) / std
+                Phi = 0.5 * (1.0 + sp.special.erf(chi / np.sqrt(2)))
+                phi = np.exp(-0.5 * chi**2) / np.sqrt(2 * np.pi * var)
+                AF.append(-((ymin - mu -self.options['search_ei_alpha']) * Phi + std * phi))
+        return np.array(AF, ndmin=2).T
+
+    # Single-objective acquisition function and its gradient at the rows of X (in the normalized space), returns arrays of size X.shape[0] and X.shape
+    # The gradients of EI and UCB are chained from the gradients of the posterior mean and variance, other cases use forward finite differences on population_fitness
+    def af_gradient(self, X):
+
+        X = np.array(X, ndmin=2, dtype=float)
+        analytic = (self.problem.DO == 1 and self.problem.OS[0].optimize != False and self.models_transfer == None and self.data.O is not None and self.problem.models is None
+                    and (self.options['search_af'] == 'EI' or self.options['search_af'] == 'UCB'))
+        if (not analytic):
+            h = np.where(X + 1e-6 > 1., -1e-6, 1e-6) # backward differences on the upper bound of the normalized space
+            Xh = np.repeat(X[np.newaxis, :, :], X.shape[1] + 1, axis=0)
+            for k in range(X.shape[1]):
+                Xh[k + 1, :, k] += h[:, k]
+            F = self.population_fitness(Xh.reshape(-1, X.shape[1]))[:, 0].reshape(X.shape[1] + 1, X.shape[0])
+            return (F[0], (F[1:] - F[0]).T / h)
+
+        (mu, var, dmu, dvar) = self.models[0].predict_gradients(X, tid=self.tid)
+        mu = np.asarray(mu, dtype=float).reshape(-1)
+        var = np.asarray(var, dtype=float).reshape(-1)
+        dvar = np.where((var < 1e-18)[:, np.newaxis], 0., dvar)
+        var = np.maximum(1e-18, var)
+        std = np.sqrt(var)
+        dstd = dvar / (2 * std[:, np.newaxis])
+        if self.options['search_af'] == 'UCB':
+            AF = mu - np.sqrt(self.options['search_ucb_beta'])*std
+            dAF = dmu - np.sqrt(self.options['search_ucb_beta'])*dstd
+        else:
+            ymin = self.data.O[self.tid][:,0].min()
+            imp = ymin - mu -self.options['search_ei_alpha']
+            chi = imp / std
+            Phi = 0.5 * (1.0 + sp.special.erf(chi / np.sqrt(2)))
+            pdf = np.exp(-0.5 * chi**2) / np.sqrt(2 * np.pi)
+            dchi = (-dmu - chi[:, np.newaxis] * dstd) / std[:, np.newaxis]
+            AF = -(imp * Phi + pdf)
+            dAF = -(-dmu * Phi[:, np.newaxis] + ((imp - chi) * pdf)[:, np.newaxis] * dchi)
+        return (AF, dAF)
+
+    # Standard normal base samples of size search_more_samples x (1000*search_more_samples) from a scrambled Sobol sequence, drawn once per search.
+    # All the q-EI and q-UCB evaluations share them (common random numbers), so that the Monte Carlo acquisition function is deterministic
+    def q_base_samples(self):
+        if getattr(self, '_q_base_samples', None) is None:
+            q = self.options['search_more_samples']
+            n = 1000*q # number of Monte Carlo samples, this is from heuristics
+            sobol = sp.stats.qmc.Sobol(d=q, scramble=True, seed=self.options['search_random_seed'])
+            U = sobol.random_base2(m=int(np.ceil(np.log2(n))))[0:n,:]
+            self._q_base_samples = sp.stats.norm.ppf(np.clip(U, 1e-12, 1-1e-12)).T
+        return self._q_base_samples
+
+    # Cholesky factors of a stack of covariance matrices S, jittered until they are SPD
+    def batched_cholesky(self, S):
+        q = S.shape[-1]
+        try:
+            return np.linalg.cholesky(S + np.eye(q)*self.options['model_jitter'])
+        except np.linalg.LinAlgError:
+            L = np.empty_like(S)
+            for k in range(S.shape[0]):
+                jitter=self.options['model_jitter']
+                flag=0
+                for i in range(self.options['model_max_jitter_try']):
+                    try:
+                        L[k] = np.linalg.cholesky(S[k] + np.eye(q)*jitter)
+                        flag=1
+                        break
+                    except np.linalg.LinAlgError:
+                        jitter=jitter*10
+                if(flag==0):
+                    raise Exception("sigma_cross not SPD after jittering")
+            return L
+
+    # q-UCB or q-EI of objective o for a stack of c candidates, each made of q points with predicted means mu (c x q) and covariance matrices S (c x q x q), returns an array of size c
+    def q_af(self, o, mu, S):
+        if self.options['search_af'] == 'q-UCB':
+            if(mu.shape[1]==1):
+                return mu[:,0]-np.sqrt(S[:,0,0]*self.options['search_ucb_beta'] * np.pi/2)
+            L = self.batched_cholesky(S *self.options['search_ucb_beta'] * np.pi/2)
+            mat = - np.absolute(L @ self.q_base_samples())
+            mat += mu[:,:,np.newaxis]
+            return np.sum(np.amax(mat, axis=1), axis=1)
+        else:
+            ymin = self.data.O[self.tid][:,o].min()
+            L = self.batched_cholesky(S)
+            mat = L @ self.q_base_samples()
+            mat += (ymin - mu -self.options['search_ei_alpha'])[:,:,np.newaxis]
+            return -np.sum(np.maximum(np.amax(mat, axis=1), 0), axis=1)
+
+    # q-UCB or q-EI evaluated for a stack of candidates Xq (c x q x number of model inputs), returns an array of size c x len(self.af(x))
+    def q_af_batch(self, Xq):
+        (c, q, d) = Xq.shape
+        chunk = max(1, 256//q) # candidates predicted together, the joint covariance matrix of their c*q points is formed
+        AF=[]
+        for o in range(self.problem.DO):
+            optimize = self.problem.OS[o].optimize
+            if (self.options['search_algo']=='pso' and optimize == False):
+                continue
+            elif (optimize == False):
+                AF.append(np.zeros(c))
+                continue
+            AF_o = np.empty(c)
+            for k in range(0, c, chunk):
+                m = min(chunk, c-k)
+                (mu, S) = self.models[o].predict(Xq[k:k+m].reshape(m*q, d), tid=self.tid, full_cov=True)
+                mu = np.asarray(mu, dtype=float).reshape(m, q)
+                S = np.asarray(S, dtype=float).reshape(m, q, m, q)[np.arange(m), :, np.arange(m), :] # diagonal blocks
+                AF_o[k:k+m] = self.q_af(o, mu, S)
+            AF.append(AF_o)
+        return np.array(AF, ndmin=2).T
+
+    def infeasible_fitness(self):
+        if(self.problem.DO==1): # single objective optimizer
+            return [self.options['search_bigval']]
+        elif(self.options['search_algo']=='pso' or self.options['search_algo']=='cmaes'):
+            return [self.options['search_bigval']]
+        else:
+            return [self.options['search_bigval']]* self.problem.DO
+
     def fitness(self, x):   # x is the normalized space
         if(self.options['search_af']=='q-UCB' or self.options['search_af']=='q-EI'):
             x=np.array(x, ndmin=2).reshape(self.options['search_more_samples'],-1)
@@ -587,7 +1202,7 @@ class SurrogateProblem(object):
         CND = True
         modeldata=[]
         for xi in xi0:
-            if (any(xx==xi for xx in self.POrig)):
+            if (self.data.has_config(self.tid, xi)):
                 cond = False
                 CND = False
             else:
@@ -605,9 +1220,7 @@ class SurrogateProblem(object):
                 if(self.problem.models is not None):    
                     if(self.options['distributed_memory_parallelism']== True):                
                         if(self.problem.driverabspath is not None):
-                            modulename = Path(self.problem.driverabspath).stem  # get the driver name excluding all directories and extensions
-                            sys.path.append(self.problem.driverabspath) # add path to sys
-                            module = importlib.import_module(modulename) # import driver name as a module
+                            module = self.problem.driver_module()
                         else:
                             raise Exception('performance models require passing driverabspath to GPTune')
                         modeldata.append(module.models(point))
@@ -625,13 +1238,103 @@ class SurrogateProblem(object):
             return self.af(xNorm)
         else:
             # print("cond",cond,float("Inf"),'x',x,'xi',xi)
-            if(self.problem.DO==1): # single objective optimizer
-                return [self.options['search_bigval']]
-            elif(self.options['search_algo']=='pso' or self.options['search_algo']=='cmaes'): 
-                return [self.options['search_bigval']]
+            return self.infeasible_fitness()
+
+    def population_fitness(self, X):   # X is a 2D array in the normalized space, one decision vector per row
+        X = np.array(X, ndmin=2)
+        if(self.options['search_af']=='q-UCB' or self.options['search_af']=='q-EI'): # each decision vector holds search_more_samples points
+            if (self.models_transfer != None or self.data.O == None or len(getattr(self.models[0], 'M_stacked', [])) > 0):
+                return np.array([self.fitness(x) for x in X], ndmin=2)
+            return self.q_population_fitness(X)
+
+        xi0 = self.problem.PS.inverse_transform(X)
+        xNorm = np.array(self.problem.PS.transform(xi0), ndmin=2)
+        CND = np.zeros(X.shape[0], dtype=bool)
+        modeldata=[]
+        point0 = self.D
+        point2 = {self.problem.IS[k].name: self.IOrig[k] for k in range(self.problem.DI)}
+        idx = []
+        points = []
+        for i in range(len(xi0)):
+            xi = xi0[i]
+            if (self.data.has_config(self.tid, xi)):
+                continue
+            point  = {self.problem.PS[k].name: xi[k] for k in range(self.problem.DP)}
+            point.update(point0)
+            point.update(point2)
+            idx.append(i)
+            points.append(point)
+        if (len(points) > 0):
+            CND[idx] = self.computer.evaluate_constraints(self.problem, points) # all constraints are evaluated at once on the whole population
+        for (i, point) in zip(idx, points):
+            if (CND[i] and self.problem.models is not None):
+                if(self.options['distributed_memory_parallelism']== True):
+                    if(self.problem.driverabspath is not None):
+                        module = self.problem.driver_module()
+                    else:
+                        raise Exception('performance models require passing driverabspath to GPTune')
+                    modeldata.append(module.models(point))
+                else:
+                    modeldata.append(self.problem.models(point))
+
+        F = np.empty((X.shape[0], len(self.infeasible_fitness())))
+        F[:] = self.infeasible_fitness()
+        if (np.any(CND)):
+            xNorm = xNorm[CND]
+            if(self.problem.models is not None):
+                xNorm = np.hstack((xNorm,np.array(modeldata).reshape(xNorm.shape[0],-1)))  # YL: here tmpdata in the normalized space, but modeldata is the in the original space
+            F[CND] = self.af_batch(xNorm)
+        return F
+
+    def q_population_fitness(self, X):   # population_fitness for q-UCB and q-EI, a candidate is infeasible if any of its search_more_samples points is
+        q = self.options['search_more_samples']
+        X = X.reshape(X.shape[0]*q, -1)
+        xi0 = self.problem.PS.inverse_transform(X)
+        xNorm = np.array(self.problem.PS.transform(xi0), ndmin=2)
+        CND = np.zeros(X.shape[0], dtype=bool)
+        point0 = self.D
+        point2 = {self.problem.IS[k].name: self.IOrig[k] for k in range(self.problem.DI)}
+        idx = []
+        points = []
+        for i in range(len(xi0)):
+            xi = xi0[i]
+            if (self.data.has_config(self.tid, xi)):
+                continue
+            point  = {self.problem.PS[k].name: xi[k] for k in range(self.problem.DP)}
+            point.update(point0)
+            point.update(point2)
+            idx.append(i)
+            points.append(point)
+        if (len(points) > 0):
+            CND[idx] = self.computer.evaluate_constraints(self.problem, points)
+        CND = np.all(CND.reshape(-1, q), axis=1)
+
+        F = np.empty((CND.shape[0], len(self.infeasible_fitness())))
+        F[:] = self.infeasible_fitness()
+        if (np.any(CND)):
+            if(self.problem.models is not None):
+                modeldata=[]
+                for (i, point) in zip(idx, points):
+                    if (CND[i//q]):
+                        if(self.options['distributed_memory_parallelism']== True):
+                            if(self.problem.driverabspath is not None):
+                                module = self.problem.driver_module()
+                            else:
+                                raise Exception('performance models require passing driverabspath to GPTune')
+                            modeldata.append(module.models(point))
+                        else:
+                            modeldata.append(self.problem.models(point))
+                xNorm = xNorm[np.repeat(CND, q)]
+                xNorm = np.hstack((xNorm,np.array(modeldata).reshape(xNorm.shape[0],-1)))  # YL: here tmpdata in the normalized space, but modeldata is the in the original space
             else:
-                return [self.options['search_bigval']]* self.problem.DO
-    
+                xNorm = xNorm[np.repeat(CND, q)]
+            F[CND] = self.q_af_batch(xNorm.reshape(-1, q, xNorm.shape[1]))
+        return F
+
+    def batch_fitness(self, dvs):   # called by pygmo's member_bfe with the decision vectors of a whole population concatenated in dvs
+        X = np.array(dvs).reshape(-1, len(self.get_bounds()[0]))
+        return self.population_fitness(X).ravel()
+
     def obj_scipy(self, x):
         return self.fitness(x)[0]
 
@@ -640,7 +1343,7 @@ from pymoo.core.problem import ElementwiseProblem
 class MyProblemPyMoo(ElementwiseProblem):
 
     def __init__(self,n_var,n_obj,prob):
-        super().__init__(n_var=n_var,n_obj=n_obj,n_constr=0,xl=np.array([0]*n_var),xu=np.array([1]*n_var))
+        super().__init__(n_var=n_var,n_obj=n_obj,n_constr=0,xl=np.array(prob.get_bounds()[0][:n_var]),xu=np.array(prob.get_bounds()[1][:n_var]))
         self.prob=prob
 
     def _evaluate(self, x, out, *args, **kwargs):
@@ -648,6 +1351,45 @@ class MyProblemPyMoo(ElementwiseProblem):
         out["F"] = fs
 
 
+from pymoo.core.termination import Termination as PyMooTermination
+class PyMooStallTermination(PyMooTermination):   # stops after n_max_gen generations, or earlier once the best objective stalls (see SearchStall)
+
+    def __init__(self, n_max_gen, tol, rounds):
+        super().__init__()
+        self.n_max_gen = n_max_gen
+        self.stall = SearchStall(tol, rounds)
+        self.n_gen = None
+
+    def _update(self, algorithm):
+        if (algorithm.n_gen != self.n_gen and algorithm.opt is not None):
+            self.n_gen = algorithm.n_gen
+            self.stall.update(float(np.min(algorithm.opt.get("F"))))
+        if (self.stall.stalled()):
+            return 1.0
+        return algorithm.n_gen / self.n_max_gen
+
+
+from pymoo.core.problem import Problem as PyMooProblem
+class MyProblemPyMooBatch(PyMooProblem):   # vectorized version of MyProblemPyMoo, x holds the whole population
+
+    def __init__(self,n_var,n_obj,prob):
+        super().__init__(n_var=n_var,n_obj=n_obj,n_constr=0,xl=np.array(prob.get_bounds()[0][:n_var]),xu=np.array(prob.get_bounds()[1][:n_var]))
+        self.prob=prob
+
+    def _evaluate(self, x, out, *args, **kwargs):
+        out["F"] = self.prob.population_fitness(x)
+
+
+class MyProblemPyMooCMO(PyMooProblem):   # vectorized constrained problem of SurrogateProblemCMO, the bounds of the output space are inequality constraints
+
+    def __init__(self,n_var,prob):
+        super().__init__(n_var=n_var,n_obj=1,n_ieq_constr=2*prob.problem.DO,xl=np.array(prob.get_bounds()[0]),xu=np.array(prob.get_bounds()[1]))
+        self.prob=prob
+
+    def _evaluate(self, x, out, *args, **kwargs):
+        (out["F"], out["G"]) = self.prob.population_objectives_constraints(x)
+
+
 class SearchPyMoo(Search):
 
     def search(self, data : Data, models : Collection[Model], tid : int, **kwargs) -> np.ndarray:
@@ -664,7 +1406,7 @@ class SearchPyMoo(Search):
 
 
         if(self.problem.DO==1 or kwargs['search_af']=='UCB-HVI'): # single objective optimizer
-            prob_pymoo = MyProblemPyMoo(self.problem.DP,1,prob)
+            prob_pymoo = MyProblemPyMooBatch(self.problem.DP,1,prob)
             if('ga'==kwargs['search_algo']):
                 from pymoo.algorithms.soo.nonconvex.ga import GA
                 from pymoo.optimize import minimize
@@ -677,18 +1419,23 @@ class SearchPyMoo(Search):
                 raise Exception(f'Unknown optimization algorithm "{kwargs["search_algo"]}"')
 
             bestX = []
+            termination = ("n_gen", kwargs["search_gen"])
+            if (kwargs['search_stall_rounds'] is not None):
+                termination = PyMooStallTermination(kwargs["search_gen"], kwargs['search_stall_tol'], kwargs['search_stall_rounds'])
             if kwargs['search_random_seed'] == None:
-                res = minimize(prob_pymoo,algo,verbose=kwargs['verbose'],seed=1)
+                res = minimize(prob_pymoo,algo,termination,verbose=kwargs['verbose'],seed=1)
             else:
                 seed = kwargs['search_random_seed']
                 if data.P is not None:
                     for P_ in data.P:
                         seed += len(P_)
-                res = minimize(prob_pymoo,algo,verbose=kwargs['verbose'],seed=seed)
+                res = minimize(prob_pymoo,algo,termination,verbose=kwargs['verbose'],seed=seed)
             bestX.append(np.array(res.X).reshape(1, self.problem.DP))
+            stalled = isinstance(res.algorithm.termination, PyMooStallTermination) and res.algorithm.termination.stall.stalled()   # minimize works on a copy of termination
+            self.search_terminations[tid] = {'reason': 'stall' if stalled else 'search_gen', 'generations': res.algorithm.n_gen}
 
         else:                   # multi objective
-            prob_pymoo = MyProblemPyMoo(self.problem.DP,self.problem.DO,prob)
+            prob_pymoo = MyProblemPyMooBatch(self.problem.DP,self.problem.DO,prob)
             if('nsga2'==kwargs['search_algo']):
                 from pymoo.algorithms.moo.nsga2 import NSGA2
                 from pymoo.optimize import minimize
@@ -703,6 +1450,7 @@ class SearchPyMoo(Search):
                 raise Exception(f'Unknown optimization algorithm "{kwargs["search_algo"]}"')
             bestX = []
             res = minimize(prob_pymoo,algo,("n_gen", kwargs["search_gen"]),verbose=kwargs['verbose'],seed=1)
+            self.search_terminations[tid] = {'reason': 'search_gen', 'generations': res.algorithm.n_gen}
             firstn = min(int(kwargs['search_more_samples']),np.shape(res.X)[0])
             xss = res.X[0:firstn]
             bestX.append(xss)
@@ -720,6 +1468,11 @@ class SearchPyGMO(Search):
     The reason is that PyGMO requires the Intel 'Thread Building Block' library to compile and execute.
     """
 
+    def search_rounds(self, kwargs : dict) -> int:
+
+        # the single-objective search evolves search_evolve times the search_threads islands of its archipelago
+        return kwargs['search_evolve']*kwargs['search_threads'] if self.problem.DO == 1 else 1
+
     def search(self, data : Data, models : Collection[Model], tid : int, **kwargs) -> np.ndarray:
         import pygmo as pg
 
@@ -731,31 +1484,55 @@ class SearchPyGMO(Search):
         if (kwargs['verbose']):
             print ("prob: ", prob)
 
-        try:
-            udi = eval(f'pg.{kwargs["search_udi"]}()')
-        except:
-            raise Exception('Unknown user-defined-island "{kwargs["search_udi"]}"')
+        token = uuid.uuid4().hex # identifies the search in the processes of search_udi='process_island'
+
+        # with search_batch_fitness, the algorithms supporting a batch fitness evaluator call prob.batch_fitness once per generation instead of prob.fitness once per individual
+        search_algo = kwargs["search_algo"]
+        bfe = None
+        if (kwargs['search_batch_fitness']):
+            if (search_algo == 'pso'):
+                search_algo = 'pso_gen' # generational variant of pso, which evaluates the whole swarm at once
+            bfe = pg.bfe(pg.member_bfe())
 
         # if(self.problem.DO==1 or kwargs['search_algo']=='pso' or kwargs['search_algo']=='cmaes' or kwargs['search_algo']==['search_af'] == 'UCB-HVI'): # single objective optimizer
         if(self.problem.DO==1 ): # single objective optimizer
             try:
-                algo = eval(f'pg.{kwargs["search_algo"]}(gen = kwargs["search_gen"])')
+                algo = eval(f'pg.{search_algo}(gen = kwargs["search_gen"])')
             except:
                 raise Exception(f'Unknown optimization algorithm "{kwargs["search_algo"]}"')
+            if (bfe is not None and hasattr(algo, 'set_bfe')):
+                algo.set_bfe(bfe)
             bestX = []
             cond = False
             cpt = 0
+            rounds = 0
             while (not cond and cpt < kwargs['search_max_iters']):
-                if kwargs['search_random_seed'] == None:
-                    archi = pg.archipelago(n = kwargs['search_threads'], prob = prob, algo = algo, udi = udi, pop_size = kwargs['search_pop_size'])
-                else:
+                seed = None
+                if kwargs['search_random_seed'] != None:
                     seed = kwargs['search_random_seed']
                     if data.P is not None:
                         for P_ in data.P:
                             seed += len(P_)
-                    archi = pg.archipelago(n = kwargs['search_threads'], prob = prob, algo = algo, udi = udi, pop_size = kwargs['search_pop_size'], seed = seed)
-                archi.evolve(n = kwargs['search_evolve'])
-                archi.wait()
+                pops = None
+                if (kwargs['search_warm_start'] and cpt == 0):
+                    pops = self.warm_start_populations(prob, tid, kwargs['search_threads'], kwargs['search_pop_size'], seed, bfe, kwargs)
+                archi = self.make_archipelago(prob, algo, token, kwargs, seed = seed, b = bfe, pops = pops)
+                stall = None
+                if (kwargs['search_stall_rounds'] is not None):   # evolve one round (search_gen generations and a migration) at a time until the champion stalls
+                    stall = SearchStall(kwargs['search_stall_tol'], kwargs['search_stall_rounds'])
+                    rounds_ = 0 # rounds of this search, each retry of search_max_iters evolves up to search_evolve rounds
+                    while (rounds_ < kwargs['search_evolve'] and not stall.stalled()):
+                        archi.evolve(n = 1)
+                        archi.wait()
+                        rounds_ += 1
+                        stall.update(min(f[0] for f in archi.get_champions_f()))
+                    rounds += rounds_
+                else:
+                    archi.evolve(n = kwargs['search_evolve'])
+                    archi.wait()
+                    rounds += kwargs['search_evolve']
+                if (kwargs['search_warm_start']):
+                    self.keep_warm_population(tid, [island.get_population() for island in archi], kwargs)
                 champions_f = archi.get_champions_f()
                 champions_x = archi.get_champions_x()
                 indexes = list(range(len(champions_f)))
@@ -770,17 +1547,37 @@ class SearchPyGMO(Search):
                             bestX.append(np.array(champions_x[idx]).reshape(1, self.problem.DP))
                         break
                 cpt += 1
+            if (not cond):
+                reason = 'search_max_iters'
+            elif (stall is not None and stall.stalled()):
+                reason = 'stall'
+            else:
+                reason = 'search_evolve'
+            self.search_terminations[tid] = {'reason': reason, 'evolve_rounds': rounds, 'searches': cpt}
         else:                   # multi objective
             try:
-                algo = eval(f'pg.algorithm(pg.{kwargs["search_algo"]}(gen = kwargs["search_gen"]))')
+                uda = eval(f'pg.{search_algo}(gen = kwargs["search_gen"])')
             except:
                 raise Exception(f'Unknown optimization algorithm "{kwargs["search_algo"]}"')
+            if (bfe is not None and hasattr(uda, 'set_bfe')):
+                uda.set_bfe(bfe)
+            algo = pg.algorithm(uda)
             bestX = []
             cond = False
             cpt = 0
             while (not cond and cpt < kwargs['search_max_iters']):
-                pop = pg.population(prob = prob, size = kwargs['search_pop_size'], seed = cpt+1)
+                pop = None
+                if (kwargs['search_warm_start'] and cpt == 0):
+                    pop = self.warm_start_populations(prob, tid, 1, kwargs['search_pop_size'], cpt+1, bfe, kwargs)
+                if (pop is not None):
+                    pop = pop[0]
+                elif (bfe is not None):
+                    pop = pg.population(prob = prob, size = kwargs['search_pop_size'], b = bfe, seed = cpt+1)
+                else:
+                    pop = pg.population(prob = prob, size = kwargs['search_pop_size'], seed = cpt+1)
                 pop = algo.evolve(pop)
+                if (kwargs['search_warm_start']):
+                    self.keep_warm_population(tid, [pop], kwargs)
 
 
                 """ It seems pop.get_f() is already sorted, no need to perform the following sorting """
@@ -807,6 +1604,7 @@ class SearchPyGMO(Search):
                     bestX.append(xss)
                     break
                 cpt += 1
+            self.search_terminations[tid] = {'reason': 'search_gen' if cond else 'search_max_iters', 'searches': cpt + int(cond)}
         if (kwargs['verbose']):
             print(tid, 'OK' if cond else 'KO'); sys.stdout.flush()
             print("bestX",bestX)
@@ -816,7 +1614,7 @@ class SearchPyGMO(Search):
 
 class SurrogateProblemCMO(object):
 
-    def __init__(self, problem, computer, data, models, options, tid):   # data is in the normalized space, IOrig and POrig are then generated in the original space
+    def __init__(self, problem, computer, data, models, options, tid):   # data is in the normalized space, IOrig is then generated in the original space
 
         self.problem = problem
         self.computer = computer
@@ -828,7 +1626,8 @@ class SurrogateProblemCMO(object):
 
         self.D     = self.data.D[tid]
         self.IOrig = self.problem.IS.inverse_transform(np.array(self.data.I[tid], ndmin=2))[0]
-        self.POrig = self.problem.PS.inverse_transform(np.array(self.data.P[tid], ndmin=2))
+        self.data.config_index(tid) # hashed set of the evaluated configurations in the original space, used to discard duplicates
+        self.bounds = search_bounds(self.problem, self.data, tid, self.options) # bounds of the search in the normalized parameter space, see search_bounds_topk
 
     def get_nobj(self):
         if(self.options['search_algo']=='pso' or self.options['search_algo']=='cmaes'):
@@ -838,99 +1637,88 @@ class SurrogateProblemCMO(object):
 
     def get_bounds(self):
 
-        DP = self.problem.DP
-
-        return ([0. for i in range(DP)], [1. for  i in range(DP)])
+        return (self.bounds[0].tolist(), self.bounds[1].tolist())
 
-    # Acquisition function
-    def af(self, x):
+    def infeasible_fitness(self):
+        return [self.options['search_bigval']]*self.get_nobj()
 
-        out_of_range = False
+    # Means predicted by the models at the rows of X (in the normalized space, points respecting the input constraints), returns an array of size X.shape[0] x self.problem.DO
+    def predict_batch(self, X):
+        MU = np.empty((X.shape[0], self.problem.DO))
         for o in range(self.problem.DO):
-            (lower_bound, upper_bound) = self.problem.OS.bounds[o]
-            (mu, var) = self.models[o].predict(x, tid=self.tid)
-            mu = mu[0][0]
-            var = max(1e-18, var[0][0])
-            std = np.sqrt(var)
-
-            print ("mu: ", mu, "var: ", var)
-            print ("lower_bound: ", lower_bound, "upper_bound: ", upper_bound)
-
-            #if mu+std < lower_bound or mu-std > upper_bound:
-            #    out_of_range = True
-            if mu < lower_bound or mu > upper_bound:
-                out_of_range = True
-
-        if out_of_range == True:
-            return [0]
-        else:
-            ret = 1
-            for o in range(self.problem.DO):
-                (mu, var) = self.models[o].predict(x, tid=self.tid)
-                ret *= abs(1.0/mu[0][0])
-                print ("ret: ", ret)
-            return [-1.0*ret]
-
-            #""" Expected Improvement """
-            #AF=[]
-            #for o in range(self.problem.DO):
-            #    ymin = self.data.O[self.tid][:,o].min()
-            #    (mu, var) = self.models[o].predict(x, tid=self.tid)
-            #    mu = mu[0][0]
-            #    var = max(1e-18, var[0][0])
-            #    std = np.sqrt(var)
-            #    chi = (ymin - mu-self.options['search_ei_alpha']) / std
-            #    Phi = 0.5 * (1.0 + sp.special.erf(chi / np.sqrt(2)))
-            #    phi = np.exp(-0.5 * chi**2) / np.sqrt(2 * np.pi * var)
-            #    AF.append(-((ymin - mu-self.options['search_ei_alpha']) * Phi + std * phi))
-
-            ##print ("AF: ", AF)
-
-            #if(self.options['search_algo']=='pso' or self.options['search_algo']=='cmaes'):
-            #    EI_prod = np.prod(AF)
-            #    return [-1.0*EI_prod if EI_prod>0 else EI_prod]
-            #else:
-            #    return AF
+            (mu, var) = self.models[o].predict(X, tid=self.tid)
+            MU[:,o] = np.asarray(mu, dtype=float).reshape(-1)
+        return MU
 
-    def fitness(self, x):   # x is the normalized space
-        xi0 = self.problem.PS.inverse_transform(np.array(x, ndmin=2))
-        xi=xi0[0]
+    # Acquisition function evaluated for all rows of X at once: 0 if a predicted output is out of the bounds of the output space, minus the product of the inverse outputs otherwise
+    def af_batch(self, X):
+        MU = self.predict_batch(np.array(X, ndmin=2))
+        (lower_bound, upper_bound) = np.array(self.problem.OS.bounds, dtype=float).T
+        out_of_range = np.any((MU < lower_bound) | (MU > upper_bound), axis=1)
+        return np.where(out_of_range, 0., -np.prod(np.abs(1.0/MU), axis=1))
 
-        if (any(xx==xi for xx in self.POrig)):
-            cond = False
-        else:
-            point0 = self.D
-            point2 = {self.problem.IS[k].name: self.IOrig[k] for k in range(self.problem.DI)}
+    # Acquisition function
+    def af(self, x):
+        return [self.af_batch(x)[0]]
+
+    def population_points(self, X):   # X is a 2D array in the normalized space, returns the mask of the rows respecting the input constraints (evaluated at once on all the rows) and not evaluated yet, and the normalized model inputs of these rows
+        X = np.array(X, ndmin=2)
+        xi0 = self.problem.PS.inverse_transform(X)
+        xNorm = np.array(self.problem.PS.transform(xi0), ndmin=2)
+        CND = np.zeros(X.shape[0], dtype=bool)
+        point0 = self.D
+        point2 = {self.problem.IS[k].name: self.IOrig[k] for k in range(self.problem.DI)}
+        idx = []
+        points = []
+        for i in range(len(xi0)):
+            xi = xi0[i]
+            if (self.data.has_config(self.tid, xi)):
+                continue
             point  = {self.problem.PS[k].name: xi[k] for k in range(self.problem.DP)}
             point.update(point0)
             point.update(point2)
-            # print("point", point)
-            cond = self.computer.evaluate_constraints(self.problem, point)
+            idx.append(i)
+            points.append(point)
+        if (len(points) > 0):
+            CND[idx] = self.computer.evaluate_constraints(self.problem, points)
+        xNorm = xNorm[CND]
+        if (self.problem.models is not None and np.any(CND)):
+            if(self.problem.driverabspath is not None):
+                module = self.problem.driver_module()
+            else:
+                raise Exception('performance models require passing driverabspath to GPTune')
+            modeldata = [module.models(point) for (i, point) in zip(idx, points) if CND[i]]
+            xNorm = np.hstack((xNorm,np.array(modeldata).reshape(xNorm.shape[0],-1)))  # YL: here tmpdata in the normalized space, but modeldata is the in the original space
+        return (CND, xNorm)
+
+    def population_fitness(self, X):   # X is a 2D array in the normalized space, one decision vector per row
+        (CND, xNorm) = self.population_points(X)
+        F = np.empty((CND.shape[0], self.get_nobj()))
+        F[:] = self.infeasible_fitness()
+        if (np.any(CND)):
+            F[CND] = self.af_batch(xNorm)[:, np.newaxis]
+        return F
+
+    # Objectives and inequality constraints (feasible if <= 0) of the rows of X for pymoo (MyProblemPyMooCMO): minus the product of the inverse predicted outputs, and the distances of the predicted outputs to the bounds of the output space.
+    # The rows violating the input constraints get search_bigval and violated output constraints
+    def population_objectives_constraints(self, X):
+        (CND, xNorm) = self.population_points(X)
+        F = np.full((CND.shape[0], 1), self.options['search_bigval'])
+        G = np.ones((CND.shape[0], 2*self.problem.DO))
+        if (np.any(CND)):
+            MU = self.predict_batch(xNorm)
+            (lower_bound, upper_bound) = np.array(self.problem.OS.bounds, dtype=float).T
+            F[CND, 0] = -np.prod(np.abs(1.0/MU), axis=1)
+            G[CND] = np.hstack((np.where(np.isfinite(lower_bound), lower_bound - MU, -1.), np.where(np.isfinite(upper_bound), MU - upper_bound, -1.)))
+        return (F, G)
 
-        if (cond):
-            xNorm = self.problem.PS.transform(xi0)[0]
-            if(self.problem.models is not None):
-                if(self.problem.driverabspath is not None):
-                    modulename = Path(self.problem.driverabspath).stem  # get the driver name excluding all directories and extensions
-                    sys.path.append(self.problem.driverabspath) # add path to sys
-                    module = importlib.import_module(modulename) # import driver name as a module
-                else:
-                    raise Exception('performance models require passing driverabspath to GPTune')
-                # modeldata= self.problem.models(point)
-                modeldata= module.models(point)
-                xNorm = np.hstack((xNorm,modeldata))  # YL: here tmpdata in the normalized space, but modeldata is the in the original space
-                # print(xNorm)
+    def fitness(self, x):   # x is the normalized space
+        return list(self.population_fitness(np.array(x, ndmin=2))[0])
+
+    def batch_fitness(self, dvs):   # called by pygmo's member_bfe with the decision vectors of a whole population concatenated in dvs
+        X = np.array(dvs).reshape(-1, len(self.get_bounds()[0]))
+        return self.population_fitness(X).ravel()
 
-            # print("cond",cond,- self.af(x),'x',x,'xi',xi)
-            # print ("AF: ", self.af(xNorm))
-            return self.af(xNorm)
-        else:
-            # print("cond",cond,float("Inf"),'x',x,'xi',xi)
-            if(self.problem.DO==1): # single objective optimizer
-                return [self.options['search_bigval']]
-            else:
-                return [self.options['search_bigval']]* self.problem.DO
-            
     def obj_scipy(self, x):
         return self.fitness(x)[0]
 
@@ -941,6 +1729,11 @@ class SearchCMO(Search):
     The reason is that PyGMO requires the Intel 'Thread Building Block' library to compile and execute.
     """
 
+    def search_rounds(self, kwargs : dict) -> int:
+
+        # the single-objective pygmo search evolves search_evolve times the search_threads islands of its archipelago
+        return kwargs['search_evolve']*kwargs['search_threads'] if (self.problem.DO == 1 and not kwargs['search_cmo_pymoo']) else 1
+
     def search(self, data : Data, models : Collection[Model], tid : int, **kwargs) -> np.ndarray:
         import pygmo as pg
 
@@ -951,23 +1744,61 @@ class SearchCMO(Search):
 
         prob = SurrogateProblemCMO(self.problem, self.computer, data, models, self.options, tid)
 
-        try:
-            udi = eval(f'pg.{kwargs["search_udi"]}()')
-        except:
-            raise Exception('Unknown user-defined-island "{kwargs["search_udi"]}"')
+        if (kwargs['search_cmo_pymoo']): # single objective pymoo search, the bounds of the output space are constraints
+            from pymoo.optimize import minimize
+            if('ga'==kwargs['search_algo']):
+                from pymoo.algorithms.soo.nonconvex.ga import GA
+                algo = GA(pop_size = kwargs["search_pop_size"])
+            elif('pso'==kwargs['search_algo']):
+                from pymoo.algorithms.soo.nonconvex.pso import PSO
+                algo = PSO(pop_size = kwargs["search_pop_size"])
+            else:
+                raise Exception(f'Unknown optimization algorithm "{kwargs["search_algo"]}"')
+            prob_pymoo = MyProblemPyMooCMO(self.problem.DP, prob)
+            bestX = []
+            cond = False
+            cpt = 0
+            while (not cond and cpt < kwargs['search_max_iters']):
+                seed = cpt+1 if kwargs['search_random_seed'] is None else kwargs['search_random_seed']+cpt
+                res = minimize(prob_pymoo,algo,("n_gen", kwargs["search_gen"]),verbose=kwargs['verbose'],seed=seed)
+                if (res.X is not None and res.F[0] < self.options['search_bigval']): # pymoo returns no solution if none satisfies the constraints
+                    cond = True
+                    bestX.append(np.array(res.X).reshape(1, self.problem.DP))
+                cpt += 1
+            self.search_terminations[tid] = {'reason': 'search_gen', 'generations': res.algorithm.n_gen, 'searches': cpt}
+            if (kwargs['verbose']):
+                print(tid, 'OK' if cond else 'KO'); sys.stdout.flush()
+            return (tid, bestX)
+
+        token = uuid.uuid4().hex # identifies the search in the processes of search_udi='process_island'
+
+        # with search_batch_fitness, the algorithms supporting a batch fitness evaluator call prob.batch_fitness once per generation instead of prob.fitness once per individual
+        search_algo = kwargs["search_algo"]
+        bfe = None
+        if (kwargs['search_batch_fitness']):
+            if (search_algo == 'pso'):
+                search_algo = 'pso_gen' # generational variant of pso, which evaluates the whole swarm at once
+            bfe = pg.bfe(pg.member_bfe())
 
         if(self.problem.DO==1): # single objective optimizer
             try:
-                algo = eval(f'pg.{kwargs["search_algo"]}(gen = kwargs["search_gen"])')
+                algo = eval(f'pg.{search_algo}(gen = kwargs["search_gen"])')
             except:
                 raise Exception(f'Unknown optimization algorithm "{kwargs["search_algo"]}"')
+            if (bfe is not None and hasattr(algo, 'set_bfe')):
+                algo.set_bfe(bfe)
             bestX = []
             cond = False
             cpt = 0
             while (not cond and cpt < kwargs['search_max_iters']):
-                archi = pg.archipelago(n = kwargs['search_threads'], prob = prob, algo = algo, udi = udi, pop_size = kwargs['search_pop_size'])
+                pops = None
+                if (kwargs['search_warm_start'] and cpt == 0):
+                    pops = self.warm_start_populations(prob, tid, kwargs['search_threads'], kwargs['search_pop_size'], None, bfe, kwargs)
+                archi = self.make_archipelago(prob, algo, token, kwargs, b = bfe, pops = pops)
                 archi.evolve(n = kwargs['search_evolve'])
                 archi.wait()
+                if (kwargs['search_warm_start']):
+                    self.keep_warm_population(tid, [island.get_population() for island in archi], kwargs)
                 champions_f = archi.get_champions_f()
                 champions_x = archi.get_champions_x()
                 indexes = list(range(len(champions_f)))
@@ -981,15 +1812,28 @@ class SearchCMO(Search):
                 cpt += 1
         else:                   # multi objective
             try:
-                algo = eval(f'pg.algorithm(pg.{kwargs["search_algo"]}(gen = kwargs["search_gen"]))')
+                uda = eval(f'pg.{kwargs["search_algo"]}(gen = kwargs["search_gen"])')
             except:
                 raise Exception(f'Unknown optimization algorithm "{kwargs["search_algo"]}"')
+            if (bfe is not None and hasattr(uda, 'set_bfe')):
+                uda.set_bfe(bfe)
+            algo = pg.algorithm(uda)
             bestX = []
             cond = False
             cpt = 0
             while (not cond and cpt < kwargs['search_max_iters']):
-                pop = pg.population(prob = prob, size = kwargs['search_pop_size'], seed = cpt+1)
+                pop = None
+                if (kwargs['search_warm_start'] and cpt == 0):
+                    pop = self.warm_start_populations(prob, tid, 1, kwargs['search_pop_size'], cpt+1, bfe, kwargs)
+                if (pop is not None):
+                    pop = pop[0]
+                elif (bfe is not None):
+                    pop = pg.population(prob = prob, size = kwargs['search_pop_size'], b = bfe, seed = cpt+1)
+                else:
+                    pop = pg.population(prob = prob, size = kwargs['search_pop_size'], seed = cpt+1)
                 pop = algo.evolve(pop)
+                if (kwargs['search_warm_start']):
+                    self.keep_warm_population(tid, [pop], kwargs)
 
                 firstn = min(int(kwargs['search_more_samples']),np.shape(pop.get_f())[0])
                 fss = pop.get_f()[0:firstn]
@@ -1060,6 +1904,292 @@ class SearchSciPy(Search):
         bestX.append(np.array(ret.x).reshape(1, self.problem.DP))
         return (tid, bestX)
 
+class SearchMultiStart(Search):
+
+    """ Multi-start L-BFGS-B on the acquisition function: the best of search_pop_size random points are refined together, with analytic gradients when the models provide them """
+
+    def search(self, data : Data, models : Collection[Model], tid : int, **kwargs) -> np.ndarray:
+
+        if(self.problem.DO>1):
+            raise Exception("'SearchMultiStart' cannot be used for multi-objective search")
+
+        kwargs = kwargs['kwargs']
+
+        prob = SurrogateProblem(self.problem, self.computer, data, models, self.options, tid, self.models_transfer)
+
+        if (kwargs['verbose']):
+            print ("prob: ", prob)
+        bestX = []
+
+        seed = kwargs['search_random_seed']
+        if(seed is not None and data.P is not None):
+            for P_ in data.P:
+                seed += len(P_)
+        rng = np.random.RandomState(seed)
+
+        print("searcher: ", kwargs["search_class"], "algorithm: ", 'l-bfgs-b')
+        DP = len(prob.get_bounds()[0])
+        bigval = self.options['search_bigval']
+
+        # select the starting points among random points, infeasible ones have fitness bigval
+        X0 = rng.rand(kwargs['search_pop_size'], DP)
+        F0 = prob.population_fitness(X0)[:, 0]
+        order = np.argsort(F0)
+        order = order[F0[order] < bigval][:kwargs['search_multistart_starts']]
+        if (len(order) == 0):
+            sampler = eval(f'{kwargs["sample_class"]}()')
+            sample_kwargs = dict(kwargs, sample_random_seed = seed) # kwargs is shared by the searches of all the tasks
+            check_constraints = functools.partial(self.computer.evaluate_constraints, self.problem, inputs_only = False, kwargs = sample_kwargs)
+            tmpP = sampler.sample_parameters(problem = self.problem, n_samples = 1, I = data.I[tid:tid+1], IS = self.problem.IS, PS = self.problem.PS, check_constraints = check_constraints, **sample_kwargs)
+            X0 = np.array(tmpP[0], ndmin=2).reshape(-1, DP)
+        else:
+            X0 = X0[order]
+
+        # the starting points are refined together: the objective is the sum of their acquisition functions, whose gradient is separable
+        def fun(z):
+            (AF, dAF) = prob.af_gradient(z.reshape(-1, DP))
+            return (np.sum(AF), dAF.ravel())
+
+        ret = sp.optimize.minimize(fun, X0.ravel(), jac=True, method='L-BFGS-B', bounds=[(0., 1.)]*X0.size, options={'maxiter': kwargs['search_gen']})
+        X = np.vstack((np.clip(ret.x.reshape(-1, DP), 0., 1.), X0))
+
+        # the refined points are checked against the constraints and the previous samples
+        F = prob.population_fitness(X)[:, 0]
+        best = np.argmin(F)
+        print('>>>>Maximal acquisition function = ',F[best],' attained at ',X[best])
+
+        bestX.append(np.array(X[best]).reshape(1, DP))
+        return (tid, bestX)
+
+class SearchTrustRegion(Search):
+
+    """ Local search in one trust region per task, in the spirit of TuRBO: the region is a box of side length L (in the normalized space) centered at the best sample of the task.
+    search_pop_size candidates are drawn in the box from a scrambled Sobol sequence, each one perturbing a random subset of the parameters of the best sample (about 20 parameters on average), and scored at once with population_fitness.
+    L is doubled after search_tr_success_tol consecutive searches improving the best sample, halved after search_tr_failure_tol consecutive searches that do not, and reset to search_tr_length_init once it is below search_tr_length_min """
+
+    def __init__(self, problem : Problem, computer : Computer, options: Options, models_transfer=None):
+
+        super().__init__(problem, computer, options, models_transfer)
+        self.trust_regions = {} # tid -> state of the trust region of task tid
+
+    def update_trust_region(self, data : Data, tid : int):
+
+        O = data.O[tid][:,0]
+        tr = self.trust_regions.get(tid)
+        if (tr is None):
+            self.trust_regions[tid] = {'length': self.options['search_tr_length_init'], 'success': 0, 'failure': 0, 'n': len(O), 'best': np.min(O)}
+            return
+        if (len(O) == tr['n']): # no new sample since the previous search
+            return
+        best = np.min(O[tr['n']:])
+        if (best < tr['best'] - 1e-3*abs(tr['best'])):
+            tr['success'] += 1
+            tr['failure'] = 0
+        else:
+            tr['success'] = 0
+            tr['failure'] += 1
+        tr['n'] = len(O)
+        tr['best'] = min(tr['best'], best)
+
+        failure_tol = self.options['search_tr_failure_tol']
+        if (failure_tol is None):
+            failure_tol = max(4, self.problem.DP)
+        if (tr['success'] >= self.options['search_tr_success_tol']):
+            tr['length'] = min(2.0*tr['length'], self.options['search_tr_length_max'])
+            tr['success'] = 0
+        elif (tr['failure'] >= failure_tol):
+            tr['length'] = tr['length']/2.0
+            tr['failure'] = 0
+        if (tr['length'] < self.options['search_tr_length_min']): # restart
+            tr['length'] = self.options['search_tr_length_init']
+            tr['success'] = 0
+            tr['failure'] = 0
+
+    def search_multitask(self, data : Data, models : Collection[Model], tids : Collection[int] = None, i_am_manager : bool = True, **kwargs) -> Collection[np.ndarray]:
+
+        # the trust regions are updated here, before the searches of the tasks are possibly sent to other processes
+        if (i_am_manager and data.O is not None):
+            for tid in (range(data.NI) if tids is None else tids):
+                if (len(data.O[tid]) > 0):
+                    self.update_trust_region(data, tid)
+
+        return super().search_multitask(data, models, tids, i_am_manager, **kwargs)
+
+    def search(self, data : Data, models : Collection[Model], tid : int, **kwargs) -> np.ndarray:
+
+        if(self.problem.DO>1):
+            raise Exception("'SearchTrustRegion' cannot be used for multi-objective search")
+
+        kwargs = kwargs['kwargs']
+
+        prob = SurrogateProblem(self.problem, self.computer, data, models, self.options, tid, self.models_transfer)
+
+        if (kwargs['verbose']):
+            print ("prob: ", prob)
+        bestX = []
+
+        seed = kwargs['search_random_seed']
+        if(seed is not None and data.P is not None):
+            for P_ in data.P:
+                seed += len(P_)
+        rng = np.random.RandomState(seed)
+
+        print("searcher: ", kwargs["search_class"], "algorithm: ", 'trust region')
+        DP = len(prob.get_bounds()[0])
+        q = DP // self.problem.DP # search_more_samples points per decision vector for q-EI and q-UCB
+
+        if (data.O is None or len(data.O[tid]) == 0): # no sample yet, the region is centered in the parameter space
+            length = self.options['search_tr_length_init']
+            center = np.full(DP, 0.5)
+        else:
+            if (tid not in self.trust_regions):
+                self.update_trust_region(data, tid)
+            length = self.trust_regions[tid]['length']
+            center = np.tile(np.array(data.P[tid][np.argmin(data.O[tid][:,0])], dtype=float), q)
+        lb = np.clip(center - length/2.0, 0., 1.)
+        ub = np.clip(center + length/2.0, 0., 1.)
+
+        n = kwargs['search_pop_size']
+        sobol = sp.stats.qmc.Sobol(d=DP, scramble=True, seed=seed)
+        X = lb + (ub - lb)*sobol.random_base2(m=int(np.ceil(np.log2(n))))[0:n,:]
+        mask = rng.rand(n, DP) <= min(1.0, 20.0/DP)
+        mask[np.arange(n), rng.randint(0, DP, size=n)] = True # perturb at least one parameter
+        X = np.where(mask, X, center)
+
+        F = prob.population_fitness(X)[:, 0]
+        best = np.argmin(F)
+        print('>>>>Maximal acquisition function = ',F[best],' attained at ',X[best], ' trust region length = ', length)
+
+        bestX.append(np.array(X[best]).reshape(q, self.problem.DP))
+        return (tid, bestX)
+
+
+class SearchMixedInteger(Search):
+
+    """ Genetic algorithm on the lattice of the integer and categorical parameters: every individual is snapped to valid integer and category values, so that distinct individuals are distinct configurations and duplicated offspring are discarded before their fitness evaluation.
+    The integer parameters are mutated by lattice steps and, when there are at most search_mixed_enum_max combinations of the categorical parameters, the population is split into one sub-population of equal size per combination, each one evolving with its categorical parameters fixed.
+    Otherwise the categorical parameters are mutated by drawing another category """
+
+    def search(self, data : Data, models : Collection[Model], tid : int, **kwargs) -> np.ndarray:
+
+        if(self.problem.DO>1):
+            raise Exception("'SearchMixedInteger' cannot be used for multi-objective search")
+
+        kwargs = kwargs['kwargs']
+
+        prob = SurrogateProblem(self.problem, self.computer, data, models, self.options, tid, self.models_transfer)
+
+        if (kwargs['verbose']):
+            print ("prob: ", prob)
+        bestX = []
+
+        seed = kwargs['search_random_seed']
+        if(seed is not None and data.P is not None):
+            for P_ in data.P:
+                seed += len(P_)
+        rng = np.random.RandomState(seed)
+
+        print("searcher: ", kwargs["search_class"], "algorithm: ", 'mixed-integer ga')
+        DP = len(prob.get_bounds()[0])
+        dims = [self.problem.PS.dimensions[j % self.problem.DP] for j in range(DP)]   # q-UCB and q-EI search search_more_samples points at once
+        integers = [j for j in range(DP) if isinstance(dims[j], skopt.space.Integer)]
+        categoricals = [j for j in range(DP) if isinstance(dims[j], skopt.space.Categorical)]
+        reals = [j for j in range(DP) if j not in integers and j not in categoricals]
+        categories = {j: np.array(dims[j].transform(dims[j].categories), dtype=float).ravel() for j in categoricals} # normalized value of each category
+        indexes = {j: {c: i for (i, c) in enumerate(dims[j].categories)} for j in categoricals}
+        sigma = kwargs['search_mixed_sigma']
+
+        def snap(X):
+            for j in integers:
+                X[:,j] = dims[j].transform(dims[j].inverse_transform(X[:,j]))
+            for j in categoricals:
+                X[:,j] = categories[j][[indexes[j][c] for c in dims[j].inverse_transform(X[:,j])]]
+            return X
+
+        ncomb = int(np.prod([len(categories[j]) for j in categoricals]))
+        enumerate_ = (1 < ncomb <= kwargs['search_mixed_enum_max'])
+        if (enumerate_):
+            quota = max(2, kwargs['search_pop_size']//ncomb) # size of the sub-population of each combination
+            combs = np.array(list(itertools.product(*[range(len(categories[j])) for j in categoricals])))
+            X = rng.rand(quota*ncomb, DP)
+            for (k, j) in enumerate(categoricals):
+                X[:,j] = categories[j][np.repeat(combs[:,k], quota)]
+        else:
+            quota = kwargs['search_pop_size']
+            X = rng.rand(quota, DP)
+        X = snap(X)
+        pop_size = len(X)
+        C = np.arange(pop_size)//quota # sub-population of each individual, the population is sorted by sub-population
+        F = prob.population_fitness(X)[:, 0]
+        nevals = pop_size
+
+        stall = None
+        if (kwargs['search_stall_rounds'] is not None):
+            stall = SearchStall(kwargs['search_stall_tol'], kwargs['search_stall_rounds'])
+        gen = 0
+        while (gen < kwargs['search_gen'] and (stall is None or not stall.stalled())):
+            gen += 1
+            # binary tournament selection, uniform crossover with an individual of the same sub-population
+            (a, b) = rng.randint(pop_size, size=(2, pop_size))
+            parents = np.where(F[a] <= F[b], a, b)
+            mates = C[parents]*quota + rng.randint(quota, size=pop_size)
+            Y = X[parents].copy()
+            cross = rng.rand(pop_size, DP) < 0.5
+            Y[cross] = X[mates][cross]
+
+            # mutation of each parameter with probability 1/DP
+            mutate = rng.rand(pop_size, DP) < 1.0/DP
+            for j in reals:
+                m = mutate[:,j]
+                Y[m,j] = np.clip(Y[m,j] + sigma*rng.randn(np.count_nonzero(m)), 0., 1.)
+            for j in integers: # at least one step on the lattice
+                m = mutate[:,j]
+                if (np.any(m)):
+                    k = dims[j].inverse_transform(Y[m,j])
+                    step = np.maximum(1, np.round(np.abs(rng.randn(len(k)))*sigma*(dims[j].high - dims[j].low)))
+                    k = np.clip(k + step*rng.choice([-1, 1], size=len(k)), dims[j].low, dims[j].high).astype(int)
+                    Y[m,j] = dims[j].transform(k)
+            if (not enumerate_):
+                for j in categoricals:
+                    m = mutate[:,j]
+                    Y[m,j] = categories[j][rng.randint(len(categories[j]), size=np.count_nonzero(m))]
+            Y = snap(Y)
+
+            # the offspring identical to an individual of the population or to another offspring are discarded
+            seen = set(x.tobytes() for x in X)
+            new = []
+            for (i, y) in enumerate(Y):
+                key = y.tobytes()
+                if (key not in seen):
+                    seen.add(key)
+                    new.append(i)
+            if (len(new) > 0):
+                X = np.vstack((X, Y[new]))
+                F = np.concatenate((F, prob.population_fitness(Y[new])[:, 0]))
+                C = np.concatenate((C, C[parents[new]]))
+                nevals += len(new)
+                # the best quota individuals of each sub-population survive
+                order = np.lexsort((F, C))
+                rank = np.arange(len(order)) - np.searchsorted(C[order], C[order])
+                keep = order[rank < quota]
+                (X, F, C) = (X[keep], F[keep], C[keep])
+
+            if (stall is not None):
+                stall.update(np.min(F))
+
+        best = np.argmin(F)
+        self.search_terminations[tid] = {'reason': 'stall' if (stall is not None and stall.stalled()) else 'search_gen', 'generations': gen, 'evaluations': nevals}
+        if (F[best] >= self.options['search_bigval']):
+            sampler = eval(f'{kwargs["sample_class"]}()')
+            sample_kwargs = dict(kwargs, sample_random_seed = seed) # kwargs is shared by the searches of all the tasks
+            check_constraints = functools.partial(self.computer.evaluate_constraints, self.problem, inputs_only = False, kwargs = sample_kwargs)
+            tmpP = sampler.sample_parameters(problem = self.problem, n_samples = 1, I = data.I[tid:tid+1], IS = self.problem.IS, PS = self.problem.PS, check_constraints = check_constraints, **sample_kwargs)
+            bestX.append(np.array(tmpP[0], ndmin=2).reshape(-1, self.problem.DP))
+            return (tid, bestX)
+        print('>>>>Maximal acquisition function = ',F[best],' attained at ',X[best])
+
+        bestX.append(np.array(X[best]).reshape(-1, self.problem.DP))
+        return (tid, bestX)
 
 if __name__ == '__main__':
 
@@ -83,6 +83,7 @@ def parse_args():
     parser.add_argument('-nrun', type=int, default=20, help='Number of runs per task')
     parser.add_argument('-perfmodel', type=int, default=0, help='Whether to use the performance model')
     parser.add_argument('-tvalue', type=float, default=1.0, help='Input task t value')
+    parser.add_argument('-searchaf', type=str, default='EI', help='Acquisition function of the search (EI, UCB, MSPE, TS, ...)')
 
     args = parser.parse_args()
 
@@ -152,6 +153,7 @@ def main():
     tvalue = args.tvalue
     TUNER_NAME = args.optimization
     perfmodel = args.perfmodel
+    searchaf = args.searchaf
 
     (machine, processor, nodes, cores) = GetMachineConfiguration()
     print ("machine: " + machine + " processor: " + processor + " num_nodes: " + str(nodes) + " num_cores: " + str(cores))
@@ -207,7 +209,7 @@ def main():
     #options['search_algo'] = 'l-bfgs-b'
 
     options['search_more_samples'] = 1
-    options['search_af']='EI'
+    options['search_af']=searchaf
     # options['search_pop_size']=1000
     # options['search_ucb_beta']=0.01
 
@@ -42,12 +42,15 @@ from callhpbandster import HpBandSter
 Example of invocation of this script:
 
 mpirun -n 1 python ./demo_parallelperformance.py -nrun 100 -ntask 5 -perfmodel 0 -distparallel 1
+mpirun -n 1 python ./demo_parallelperformance.py -nrun 40 -ntask 1 -searchthreads 4 -searchudi process_island
 
 where:
     -ntask is the number of different matrix sizes that will be tuned
     -nrun is the number of calls per task
     -perfmodel is whether a coarse performance model is used
     -distparallel is whether distributed-memory parallelism is used inside GPTune
+    -searchthreads is the number of islands of the pygmo search of each task
+    -searchudi is the type of these islands, process_island evaluates the islands in parallel processes
 """
 
 ################################################################################
@@ -74,6 +77,8 @@ def parse_args():
     parser.add_argument('-nrun', type=int, default=20, help='Number of runs per task')
     parser.add_argument('-perfmodel', type=int, default=0, help='Whether to use the performance model')
     parser.add_argument('-distparallel', type=int, default=0, help='Whether to use distributed-memory parallelism in the modeling and search phase')
+    parser.add_argument('-searchthreads', type=int, default=1, help='Number of islands of the pygmo search of each task (search_threads)')
+    parser.add_argument('-searchudi', type=str, default='thread_island', help='pygmo island of the search: thread_island, mp_island or process_island (search_udi)')
 
 
     args = parser.parse_args()
@@ -146,6 +151,8 @@ def main():
     nrun = args.nrun
     perfmodel = args.perfmodel
     distparallel = args.distparallel
+    searchthreads = args.searchthreads
+    searchudi = args.searchudi
     (machine, processor, nodes, cores) = GetMachineConfiguration()
     print ("machine: " + machine + " processor: " + processor + " num_nodes: " + str(nodes) + " num_cores: " + str(cores))
     os.environ['MACHINE_NAME'] = machine
@@ -186,7 +193,8 @@ def main():
 
     # options['search_multitask_processes'] = 1
     # options['search_multitask_threads'] = 1
-    # options['search_threads'] = 16
+    options['search_threads'] = searchthreads
+    options['search_udi'] = searchudi
 
 
     # options['mpi_comm'] = None
@@ -214,6 +222,7 @@ def main():
         # (data, modeler, stats) = gt.MLA(NS=NS, Tgiven=giventask, NI=NI, NS1=int(NS/2))
         (data, modeler, stats) = gt.MLA(NS=NS, Tgiven=giventask, NI=NI, NS1=NS-1)
         print("stats: ", stats)
+        print("search_threads: ", searchthreads, " search_udi: ", searchudi, " time_search: ", stats['time_search'])
         # """ Print all input and parameter samples """
         # for tid in range(NI):
         #     print("tid: %d" % (tid))
@@ -0,0 +1,162 @@
+#! /usr/bin/env python
+
+# GPTune Copyright (c) 2019, The Regents of the University of California,
+# through Lawrence Berkeley National Laboratory (subject to receipt of any
+# required approvals from the U.S.Dept. of Energy) and the University of
+# California, Berkeley.  All rights reserved.
+#
+# If you have questions about your rights to use or distribute this software,
+# please contact Berkeley Lab's Intellectual Property Office at IPO@lbl.gov.
+#
+# NOTICE. This Software was developed under funding from the U.S. Department
+# of Energy and the U.S. Government consequently retains certain rights.
+# As such, the U.S. Government has been granted for itself and others acting
+# on its behalf a paid-up, nonexclusive, irrevocable, worldwide license in
+# the Software to reproduce, distribute copies to the public, prepare
+# derivative works, and perform publicly and display publicly, and to permit
+# other to do so.
+#
+
+
+"""
+Example of invocation of this script:
+
+python ./demo_search_udi.py -nrun 40 -ntask 1 -searchthreads 1,2,4 -popsize 200 -gen 20
+
+where:
+    -ntask is the number of tasks
+    -nrun is the number of samples per task, the first nrun-1 are the pilot samples and the last one is searched
+    -searchthreads is the comma-separated list of the numbers of islands of the pygmo search of each task (search_threads)
+    -popsize and -gen are the population size and the number of generations of each island (search_pop_size, search_gen)
+
+For each number of islands, the search of the same model (same seeds) is timed with search_udi='thread_island' and search_udi='process_island', and the 'time_search' of both is reported.
+pygmo's thread_island only evolves problems providing at least the 'basic' thread safety guarantee, which Python problems such as the surrogate problem of SearchPyGMO do not: the islands then fail without evolving, so thread_island is first probed with a small Python problem and reported as unsupported instead of timed.
+No speedup of process_island is claimed, the timings depend on the number of cores and on the cost of the surrogate problem.
+"""
+
+################################################################################
+import sys
+import os
+import logging
+
+sys.path.insert(0, os.path.abspath(__file__ + "/../../../GPTune/"))
+logging.getLogger('matplotlib.font_manager').disabled = True
+
+from autotune.space import *
+from autotune.problem import *
+from gptune import * # import all
+import search
+
+import argparse
+import numpy as np
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-cores', type=int, default=max(2, os.cpu_count()), help='Number of cores of the machine')
+    parser.add_argument('-ntask', type=int, default=1, help='Number of tasks')
+    parser.add_argument('-nrun', type=int, default=40, help='Number of runs per task')
+    parser.add_argument('-searchthreads', type=str, default='1,2,4', help='Comma-separated numbers of islands of the pygmo search of each task (search_threads)')
+    parser.add_argument('-popsize', type=int, default=1000, help='Population size of each island (search_pop_size)')
+    parser.add_argument('-gen', type=int, default=100, help='Number of generations of each evolve (search_gen)')
+
+    args = parser.parse_args()
+
+    return args
+
+def objectives(point):
+    """
+    f(t,x) = exp(- (x + 1) ^ (t + 1) * cos(2 * pi * x)) * (sin( (t + 2) * (2 * pi * x) ) + sin( (t + 2)^(2) * (2 * pi * x) + sin ( (t + 2)^(3) * (2 * pi *x))))
+    """
+    t = point['t']
+    x = point['x']
+    a = 2 * np.pi
+    b = a * t
+    c = a * x
+    d = np.exp(- (x + 1) ** (t + 1)) * np.cos(c)
+    e = np.sin((t + 2) * c) + np.sin((t + 2)**2 * c) + np.sin((t + 2)**3 * c)
+    f = d * e + 1
+
+    return [f]
+
+class ProbeProblem(object):   # the smallest Python problem, to probe whether thread_island can evolve Python problems
+
+    def fitness(self, x):
+        return [float(np.sum(x**2))]
+
+    def get_bounds(self):
+        return ([0.]*2, [1.]*2)
+
+def thread_island_supported():
+
+    import pygmo as pg
+
+    isl = pg.island(udi = pg.thread_island(), algo = pg.algorithm(pg.pso(gen = 1)), prob = pg.problem(ProbeProblem()), size = 10)
+    isl.evolve()
+    try:
+        isl.wait_check()
+    except Exception as e:
+        print("thread_island cannot evolve Python problems: %s" % (str(e).strip().splitlines()[-1]))
+        return False
+    return True
+
+def main():
+
+    args = parse_args()
+    ntask = args.ntask
+    nrun = args.nrun
+    searchthreads = [int(st) for st in args.searchthreads.split(',')]
+
+    input_space = Space([Real(0., 10., transform="normalize", name="t")])
+    parameter_space = Space([Real(0., 1., transform="normalize", name="x")])
+    output_space = Space([Real(float('-Inf'), float('Inf'), name="y")])
+    constraints = {"cst1": "x >= 0. and x <= 1."}
+    problem = TuningProblem(input_space, parameter_space, output_space, objectives, constraints, None)
+
+    computer = Computer(nodes=1, cores=args.cores, hosts=None)
+
+    giventask = [[i] for i in np.arange(0, ntask/2, 0.5).tolist()]
+    NI = len(giventask)
+    NS = nrun
+
+    udis = ['thread_island', 'process_island'] if thread_island_supported() else ['process_island']
+
+    timings = {}
+    for st in searchthreads:
+        for udi in udis:
+            options = Options()
+            options['model_restarts'] = 1
+            options['distributed_memory_parallelism'] = False
+            options['shared_memory_parallelism'] = False
+            options['objective_evaluation_parallelism'] = False
+            options['model_processes'] = 1
+            options['model_class'] = 'Model_GPy_LCM'
+            options['sample_class'] = 'SampleLHSMDU'
+            options['sample_random_seed'] = 0
+            options['model_random_seed'] = 0
+            options['search_random_seed'] = 0
+            options['search_class'] = 'SearchPyGMO'
+            options['search_threads'] = st
+            options['search_udi'] = udi
+            options['search_pop_size'] = args.popsize
+            options['search_gen'] = args.gen
+            options['verbose'] = False
+            options.validate(computer=computer)
+
+            data = Data(problem)
+            gt = GPTune(problem, computer=computer, data=data, options=options, historydb=False)
+            (data, modeler, stats) = gt.MLA(NS=NS, Tgiven=giventask, NI=NI, NS1=NS-1)
+            timings[(st, udi)] = stats['time_search']
+
+    search.shutdown_executors()
+
+    print("search_threads  time_search(thread_island)  time_search(process_island)")
+    for st in searchthreads:
+        thread_timing = "%26.3f" % (timings[(st, 'thread_island')]) if (st, 'thread_island') in timings else "%26s" % ("unsupported")
+        print("%14d  %s  %27.3f" % (st, thread_timing, timings[(st, 'process_island')]))
+
+
+if __name__ == "__main__": # the processes of search_udi='process_island' are spawned and import this script
+    main()
@@ -0,0 +1,190 @@
+#! /usr/bin/env python
+
+# GPTune Copyright (c) 2019, The Regents of the University of California,
+# through Lawrence Berkeley National Laboratory (subject to receipt of any
+# required approvals from the U.S.Dept. of Energy) and the University of
+# California, Berkeley.  All rights reserved.
+#
+# If you have questions about your rights to use or distribute this software,
+# please contact Berkeley Lab's Intellectual Property Office at IPO@lbl.gov.
+#
+# NOTICE. This Software was developed under funding from the U.S. Department
+# of Energy and the U.S. Government consequently retains certain rights.
+# As such, the U.S. Government has been granted for itself and others acting
+# on its behalf a paid-up, nonexclusive, irrevocable, worldwide license in
+# the Software to reproduce, distribute copies to the public, prepare
+# derivative works, and perform publicly and display publicly, and to permit
+# other to do so.
+#
+
+
+"""
+Example of invocation of this script:
+
+python ./demo_smoke.py -nrun 8 -ntask 2
+
+where:
+    -ntask is the number of tasks of the MLA runs
+    -nrun is the number of samples per task of the MLA runs, the first nrun/2 are the pilot samples
+
+Smoke checks of the batched search paths, without database:
+    mla       -- multi-iteration MLA runs with Thompson sampling (search_af='TS'), batches of points with fantasized outputs (search_batch_size=2), the GPy model instead of the default NumPy predictor (search_predictor=False) and the batch evaluation of the acquisition function (search_batch_fitness), each task must get nrun distinct samples
+    predictor -- mean and variance of Model.export_predictor against the trained GPy model
+    hvi       -- hypervolume improvements of UCB-HVI (box decomposition) against pygmo.hypervolume
+    cst       -- feasibility mask of the constraints evaluated on a whole batch of points against the point by point evaluation
+Prints PASS or FAIL for each check and asserts it: the first failed check raises an AssertionError, so that the exit status is nonzero.
+"""
+
+################################################################################
+import sys
+import os
+import logging
+
+sys.path.insert(0, os.path.abspath(__file__ + "/../../../GPTune/"))
+logging.getLogger('matplotlib.font_manager').disabled = True
+
+from autotune.space import *
+from autotune.problem import *
+from gptune import * # import all
+
+import argparse
+import numpy as np
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-ntask', type=int, default=2, help='Number of tasks')
+    parser.add_argument('-nrun', type=int, default=8, help='Number of runs per task')
+
+    args = parser.parse_args()
+
+    return args
+
+def objectives(point):
+    """
+    f(t,x) = exp(- (x + 1) ^ (t + 1) * cos(2 * pi * x)) * (sin( (t + 2) * (2 * pi * x) ) + sin( (t + 2)^(2) * (2 * pi * x) + sin ( (t + 2)^(3) * (2 * pi *x))))
+    """
+    t = point['t']
+    x = point['x']
+    a = 2 * np.pi
+    b = a * t
+    c = a * x
+    d = np.exp(- (x + 1) ** (t + 1)) * np.cos(c)
+    e = np.sin((t + 2) * c) + np.sin((t + 2)**2 * c) + np.sin((t + 2)**3 * c)
+    f = d * e + 1
+
+    return [f]
+
+def check(name, ok, detail):
+
+    print("%-10s %s  %s" % (name, "PASS" if ok else "FAIL", detail))
+    assert ok, "%s: %s" % (name, detail)
+
+def run_mla(problem, computer, giventask, NS, **kwargs):
+
+    options = Options()
+    options['model_restarts'] = 1
+    options['distributed_memory_parallelism'] = False
+    options['shared_memory_parallelism'] = False
+    options['model_class'] = 'Model_GPy_LCM'
+    options['sample_class'] = 'SampleLHSMDU'
+    options['sample_random_seed'] = 0
+    options['model_random_seed'] = 0
+    options['search_random_seed'] = 0
+    options['search_pop_size'] = 100
+    options['search_gen'] = 10
+    options['verbose'] = False
+    for (key, value) in kwargs.items():
+        options[key] = value
+    options.validate(computer=computer)
+
+    gt = GPTune(problem, computer=computer, data=Data(problem), options=options, historydb=False)
+    return gt.MLA(NS=NS, Tgiven=giventask, NI=len(giventask), NS1=int(NS/2))
+
+def check_mla(problem, computer, giventask, NS):
+
+    modeler = None
+    for kwargs in [{'search_af': 'TS'}, {'search_af': 'TS', 'search_batch_size': 2}, {'search_af': 'EI', 'search_batch_size': 2}, {'search_af': 'EI', 'search_predictor': False}, {'search_af': 'EI', 'search_batch_fitness': True}]:
+        (data, modeler, stats) = run_mla(problem, computer, giventask, NS, **kwargs)
+        nsamples = [len(P) for P in data.P]
+        ndistinct = [len(set(map(tuple, P))) for P in data.P]
+        check("mla", nsamples == [NS]*len(giventask) and ndistinct == nsamples, "%s samples %s distinct %s" % (kwargs, nsamples, ndistinct))
+    return (data, modeler)
+
+def check_predictor(data, modeler):
+
+    X = np.random.RandomState(0).rand(50, len(data.P[0][0]))
+    for o in range(len(modeler)):
+        predictor = modeler[o].export_predictor()
+        check("predictor", predictor is not None, "objective %d: the model can be exported" % (o))
+        for tid in range(len(data.I)):
+            (mu, var) = modeler[o].predict(X, tid)
+            (mu_, var_) = predictor.predict(X, tid)
+            err_mu = np.max(np.abs(np.ravel(mu) - np.ravel(mu_)))
+            err_var = np.max(np.abs(np.ravel(var) - np.ravel(var_)))
+            check("predictor", err_mu < 1e-6 and err_var < 1e-6, "objective %d task %d: max error mean %.2e variance %.2e" % (o, tid, err_mu, err_var))
+
+def check_hvi():
+
+    import pygmo as pg
+    from search import SurrogateProblem
+
+    rng = np.random.RandomState(0)
+    for DO in [2, 3, 4]:
+        O = rng.rand(40, DO)
+        O[:,-1] = 1.2 - O[:,:-1].mean(axis=1) + 0.1*rng.rand(40)
+        B = O.max(axis=0)
+        prob = SurrogateProblem.__new__(SurrogateProblem) # only the Pareto front and the reference point are needed
+        prob.PF = ParetoArchive(DO, O).F
+        prob.B = B
+        (prob.HV_lower, prob.HV_upper) = prob.hv_box_decomposition(prob.PF, prob.B)
+        Y = rng.rand(200, DO)*B*1.1
+        hvi = prob.hvi_batch(Y)
+        ref = np.zeros(len(Y))
+        for (i, y) in enumerate(Y):
+            if (np.all(y <= B) and not np.any(np.all(prob.PF <= y, axis=1))):
+                points = np.vstack((prob.PF, y))
+                ref[i] = pg.hypervolume(points).exclusive(len(points)-1, B)
+        err = np.max(np.abs(hvi - ref))
+        check("hvi", err < 1e-9, "DO %d front %d: max error %.2e" % (DO, len(prob.PF), err))
+
+def check_cst(computer):
+
+    rng = np.random.RandomState(0)
+    input_space = Space([Categoricalnorm(['0', '1', '2'], transform="onehot", name="t")])
+    parameter_space = Space([Integer(1, 20, transform="normalize", name="Px"), Integer(1, 20, transform="normalize", name="Py"), Real(0., 1., transform="normalize", name="x"), Integer(0, 20, transform="normalize", name="a")])
+    output_space = Space([Real(float('-Inf'), float('Inf'), name="y")])
+    points = [{'t': str(rng.randint(0, 3)), 'Px': int(rng.randint(1, 20)), 'Py': int(rng.randint(1, 20)), 'x': float(rng.rand()), 'a': int(rng.randint(0, 20))} for _ in range(1000)]
+    for constraints in [{"cst1": "Px * Py <= Nproc", "cst2": "x >= 0.1 and x <= 0.9", "cst3": "not(t == '0' and x > 0.5)", "cst4": "Px // Py % 3 != 1"},
+                        {"cst1": "2**(a*10) < 1e20"}]: # the second one overflows int64
+        problem = Problem(TuningProblem(input_space, parameter_space, output_space, objectives, constraints, None, constants={"Nproc": 64}))
+        mask = computer.evaluate_constraints(problem, [dict(point) for point in points])
+        ref = np.array([bool(computer.evaluate_constraints(problem, dict(point))) for point in points])
+        check("cst", np.array_equal(mask, ref), "%s: %d feasible, %d differences" % (list(constraints.values()), np.sum(ref), np.sum(mask != ref)))
+
+def main():
+
+    args = parse_args()
+    ntask = args.ntask
+    nrun = args.nrun
+
+    input_space = Space([Real(0., 10., transform="normalize", name="t")])
+    parameter_space = Space([Real(0., 1., transform="normalize", name="x")])
+    output_space = Space([Real(float('-Inf'), float('Inf'), name="y")])
+    constraints = {"cst1": "x >= 0. and x <= 1."}
+    problem = TuningProblem(input_space, parameter_space, output_space, objectives, constraints, None)
+    computer = Computer(nodes=1, cores=2, hosts=None)
+    giventask = [[round(1.0*float(i+1),1)] for i in range(ntask)]
+
+    (data, modeler) = check_mla(problem, computer, giventask, nrun)
+    check_predictor(data, modeler)
+    check_hvi()
+    check_cst(computer)
+
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,8 @@ tuner=GPTune
 rm -rf gptune.db/*.json # do not load any database
 #$RUN
 python ./demo.py -optimization ${tuner} -ntask 2 -nrun 20
+python ./demo.py -optimization ${tuner} -ntask 2 -nrun 8 -searchaf TS # Thompson sampling, 4 MLA iterations after the 4 pilot samples per task
+python ./demo_smoke.py -ntask 2 -nrun 8 # smoke checks of the batched search paths, prints PASS or FAIL for each
 # python ./demo_wgp.py -optimization ${tuner} -ntask 1 -nrun 20
 ###########################################################################################
 
@@ -63,6 +65,10 @@ $RUN python ./demo_perf_model.py -nrun 20 -ntask 1 -perfmodel 1 -plot 1 | tee a.
     #  $RUN python ./demo_parallelperformance.py -ntask 20 -nrun 40  | tee a.out_seqential # this is the sequential benchmark
     #  rm -rf gptune.db/*.json
     #  $RUN python ./demo_parallelperformance.py -ntask 20 -nrun 40 -distparallel 1 | tee a.out_parallel # this is parallel modeling and search
+    #  # search speedup versus search_threads on a single node: the islands of the pygmo search of each task evolve in parallel processes with -searchudi process_island, compare 'time_search' of the runlogs (with -searchudi thread_island the islands share the GIL)
+    #  for st in 1 2 4 8; do rm -rf gptune.db/*.json; $RUN python ./demo_parallelperformance.py -ntask 1 -nrun 40 -searchthreads $st -searchudi process_island | tee a.out_search_threads_$st; done
+    #  # the same comparison without MPI or database: times the search of the same model with thread_island and process_island for each search_threads
+    #  python ./demo_search_udi.py -ntask 1 -nrun 40 -searchthreads 1,2,4,8 -popsize 200 -gen 20 | tee a.out_search_udi
     # # ###########################################################################################
 # fi
 